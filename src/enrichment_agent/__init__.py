@@ -1,13 +1,6 @@
 """Enrichment for a pre-defined schema."""
 
-from enrichment_agent.graph import graph
-from enrichment_agent.state import (
-    DocumentInfo,
-    DocumentStructure,
-    State,
-    InputState,
-    OutputState
-)
+from typing import Any, List
 
 __all__ = [
     "graph",
@@ -17,3 +10,25 @@ __all__ = [
     "InputState",
     "OutputState"
 ]
+
+_STATE_EXPORTS = {"DocumentInfo", "DocumentStructure", "State", "InputState", "OutputState"}
+
+
+def __getattr__(name: str) -> Any:
+    """Import exports on first access so state-only imports don't build the graph."""
+    if name == "graph":
+        from enrichment_agent.graph import graph as value
+    elif name in _STATE_EXPORTS:
+        from enrichment_agent import state
+
+        value = getattr(state, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Importing enrichment_agent.graph binds the submodule to this name; rebind the export.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """List the public exports."""
+    return list(__all__)
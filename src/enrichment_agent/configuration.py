@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass, field, fields
-from typing import Annotated, Optional
+from typing import Annotated, Any, ClassVar, Optional
 
 from langchain_core.runnables import RunnableConfig, ensure_config
 
@@ -33,6 +34,98 @@ class Configuration:
     )
 
 
+    bibliography_model: Annotated[str, {"__template_metadata__": {"kind": "llm"}}] = field(
+        default="openai/gpt-4.1-mini-2025-04-14",
+        metadata={
+            "description": "The language model used to parse extracted bibliography text into structured entries. "
+            "Should be in the form: provider/model-name."
+        },
+    )
+
+    bibliography_model_fallback: Optional[str] = field(
+        default="openai/gpt-4o",
+        metadata={
+            "description": "A stronger model to retry bibliography parsing with when the primary model returns fewer "
+            "than bibliography_min_entries entries. Set to None to disable the fallback."
+        },
+    )
+
+    bibliography_min_entries: int = field(
+        default=3,
+        metadata={
+            "description": "Minimum number of parsed bibliography entries before the fallback model is tried."
+        },
+    )
+
+    vision_image_max_dim: int = field(
+        default=1568,
+        metadata={
+            "description": "Longest side, in pixels, of page images sent to the vision model. 1568px is Anthropic's "
+            "recommended maximum; larger images are downscaled by the provider anyway."
+        },
+    )
+
+    vision_jpeg_quality: int = field(
+        default=85,
+        metadata={
+            "description": "JPEG quality (1-100) used when encoding page images for the vision model."
+        },
+    )
+
+    vision_max_file_size_mb: Optional[float] = field(
+        default=None,
+        metadata={
+            "description": "Skip the page-image vision steps (title and TOC extraction) for PDFs larger than this many "
+            "megabytes and fall back to the PDF metadata title. None disables the limit."
+        },
+    )
+
+    extraction_cache_dir: Optional[str] = field(
+        default=None,
+        metadata={
+            "description": "Directory for caching per-document extraction results (title, TOC, references), keyed by "
+            "the SHA-256 of the PDF and the models that produced them. None disables the cache."
+        },
+    )
+
+    refresh_extraction_cache: bool = field(
+        default=False,
+        metadata={
+            "description": "Recompute the extraction results even when cached entries exist, overwriting them."
+        },
+    )
+
+    llm_cache_path: Optional[str] = field(
+        default=".enrichment_llm_cache.db",
+        metadata={
+            "description": "Path to a SQLite database used to cache LLM responses, so re-analyzing the same document "
+            "skips repeated title/TOC/bibliography calls. Set to None to disable caching."
+        },
+    )
+
+    use_prompt_caching: bool = field(
+        default=True,
+        metadata={
+            "description": "Mark the static vision prompts with Anthropic's cache_control so repeated calls reuse the "
+            "provider-side prompt cache. Ignored for non-Anthropic models."
+        },
+    )
+
+    latency_optimized: bool = field(
+        default=False,
+        metadata={
+            "description": "Request the provider's latency-optimized inference tier where available "
+            "(Bedrock performanceConfig latency=optimized, OpenAI service_tier=priority). Both are billed at a premium."
+        },
+    )
+
+    extra_model_kwargs: dict[str, Any] = field(
+        default_factory=dict,
+        metadata={
+            "description": "Additional keyword arguments passed through to every chat model constructor."
+        },
+    )
+
     prompt: str = field(
         default=prompts.MAIN_PROMPT,
         metadata={
@@ -48,6 +141,38 @@ class Configuration:
         },
     )
 
+    toc_pages_per_call: int = field(
+        default=4,
+        metadata={
+            "description": "How many table of contents page images are sent to the vision model in one request. "
+            "Longer TOCs are split into groups that are extracted concurrently; 1 sends one request per page."
+        },
+    )
+
+    max_parallel_llm_calls: int = field(
+        default=5,
+        metadata={
+            "description": "The maximum number of LLM requests issued concurrently when a step is split into chunks "
+            "(e.g. parsing a multi-page bibliography or reading several TOC pages)."
+        },
+    )
+
+    render_workers: int = field(
+        default_factory=lambda: os.cpu_count() or 1,
+        metadata={
+            "description": "The number of worker processes used for CPU-bound PDF work: rasterizing pages for the vision model "
+            "and scanning pages for tables."
+        },
+    )
+
+    extract_tables: bool = field(
+        default=False,
+        metadata={
+            "description": "Also scan every page for tables with pdfplumber during document analysis. "
+            "Runs in parallel with the other analysis steps but can be slow on long documents."
+        },
+    )
+
     max_info_tool_calls: int = field(
         default=3,
         metadata={
@@ -62,6 +187,17 @@ class Configuration:
         },
     )
 
+    _INIT_FIELDS: ClassVar[Optional[frozenset[str]]] = None
+
+    @classmethod
+    def _init_field_names(cls) -> frozenset[str]:
+        """Return the init field names, computed once per class."""
+        names = cls.__dict__.get("_INIT_FIELDS")
+        if names is None:
+            names = frozenset(f.name for f in fields(cls) if f.init)
+            cls._INIT_FIELDS = names
+        return names
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -69,5 +205,5 @@ class Configuration:
         """Load configuration w/ defaults for the given invocation."""
         config = ensure_config(config)
         configurable = config.get("configurable") or {}
-        _fields = {f.name for f in fields(cls) if f.init}
+        _fields = cls._init_field_names()
         return cls(**{k: v for k, v in configurable.items() if k in _fields})
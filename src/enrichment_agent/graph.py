@@ -3,98 +3,275 @@
 Works with document processing tools to extract and analyze PDF content.
 """
 
-import json
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
 
 from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.constants import Send
 from langgraph.graph import StateGraph
 
 from enrichment_agent.configuration import Configuration
-from enrichment_agent.state import InputState, OutputState, State
-from enrichment_agent.tools import (
-    validate_document_tool, extract_title_tool, extract_toc_tool, extract_references_tool,
-    extract_tables_tool, extract_all_tables_tool, detect_tables_text_analysis_tool,
-    extract_metadata_from_query_tool, generate_search_query_tool
+from enrichment_agent.state import (
+    DocumentInfo,
+    DocumentStructure,
+    InputState,
+    OutputState,
+    State,
+)
+from enrichment_agent.utils import (
+    compute_file_digest,
+    extract_all_tables_from_pdf,
+    extract_bibliography_full_pipeline,
+    extract_metadata_from_user_query,
+    extract_title_with_vision,
+    extract_toc_from_pages_with_vision,
+    find_toc_pages,
+    load_extraction_cache,
+    store_extraction_cache,
+    validate_document,
 )
 
 
-async def document_analysis(
+async def prepare_document(
     state: State, *, config: Optional[RunnableConfig] = None
-) -> State:
-    """Run document validation, title, TOC, and references extraction, updating the state."""
+) -> Dict[str, Any]:
+    """Check the input path before any extraction work is scheduled.
+
+    The file is stat'ed once here and its size recorded, so bad inputs cost no
+    LLM calls and later steps don't need to stat it again.
+    """
     pdf_path = state.document_path
     if not pdf_path:
         print("❌ No document_path provided in state!")
-        return state
-    
+        return {}
+    try:
+        file_stat = os.stat(pdf_path)
+    except OSError as e:
+        print(f"❌ Cannot read document_path {pdf_path}: {e}")
+        return {"processing_stage": "error_invalid_path"}
+    if not pdf_path.lower().endswith(".pdf"):
+        print(f"❌ document_path is not a PDF: {pdf_path}")
+        return {"processing_stage": "error_invalid_path"}
     print(f"📄 Starting document analysis for: {pdf_path}")
     print(f"🎯 User topic: {state.topic}")
-    
-    # Step 1: Extract metadata from user query
+    content_hash = None
+    if Configuration.from_runnable_config(config).extraction_cache_dir:
+        content_hash = await asyncio.to_thread(compute_file_digest, pdf_path)
+    return {
+        "processing_stage": "document_analysis",
+        "document_info": DocumentInfo(
+            path=pdf_path, file_type="PDF", file_size=file_stat.st_size, content_hash=content_hash
+        ),
+    }
+
+
+def _skip_vision(state: State, config: Optional[RunnableConfig]) -> bool:
+    """Return True when the document is too large for the page-image vision steps."""
+    limit_mb = Configuration.from_runnable_config(config).vision_max_file_size_mb
+    file_size = state.document_info.file_size
+    return limit_mb is not None and file_size is not None and file_size > limit_mb * 1024 * 1024
+
+
+def _cache_entry_name(name: str, models: Sequence[Optional[str]]) -> str:
+    """Suffix a cache entry name with a short hash of the models that produce it."""
+    if not any(models):
+        return name
+    tag = hashlib.sha1("|".join(model or "" for model in models).encode()).hexdigest()[:12]
+    return f"{name}-{tag}"
+
+
+async def _cached_extraction(
+    name: str,
+    state: State,
+    config: Optional[RunnableConfig],
+    compute: Callable[[], Awaitable[Any]],
+    models: Sequence[Optional[str]] = (),
+) -> Any:
+    """Return a per-document cached result for ``name``, computing and storing it on a miss.
+
+    The entry is keyed on the document's content hash and the models that produce it, so
+    switching models misses instead of returning stale results. Empty results are not
+    stored, so a failed extraction is retried next run.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    cache_dir = configuration.extraction_cache_dir
+    digest = state.document_info.content_hash
+    name = _cache_entry_name(name, models)
+    if cache_dir and digest and not configuration.refresh_extraction_cache:
+        cached = load_extraction_cache(cache_dir, digest, name)
+        if cached is not None:
+            print(f"💾 Using cached {name} for document {digest[:12]}")
+            return cached
+    result = await compute()
+    if cache_dir and digest and result:
+        store_extraction_cache(cache_dir, digest, name, result)
+    return result
+
+
+async def extract_metadata(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Dict[str, Any]:
+    """Extract metadata (country, year, ...) from the user's topic."""
     try:
-        await extract_metadata_from_query_tool(user_query=state.topic, state=state, config=config)
-        print(f"✅ Extracted metadata: {state.document_info.metadata if state.document_info else 'None'}")
+        metadata = await asyncio.to_thread(extract_metadata_from_user_query, state.topic, config)
     except Exception as e:
-        print(f"⚠️ extract_metadata_from_query_tool failed: {e}")
-    
-    # Step 2: Validate document
+        print(f"⚠️ extract_metadata failed: {e}")
+        return {}
+    print(f"✅ Extracted metadata: {metadata}")
+    return {"document_info": DocumentInfo(metadata=metadata)}
+
+
+async def validate_doc(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Dict[str, Any]:
+    """Validate the PDF and record its basic file metadata.
+
+    The PDF metadata title is only used when the vision title step is skipped;
+    otherwise extract_title runs in the same step and its title is the one we keep.
+    """
     try:
-        await validate_document_tool(pdf_path=pdf_path, state=state, config=config)
-        print(f"✅ Document validation complete")
+        result = await _cached_extraction(
+            "validate_doc", state, config,
+            lambda: asyncio.to_thread(validate_document, state.document_path),
+        )
     except Exception as e:
-        print(f"⚠️ validate_document_tool failed: {e}")
-    
-    # Step 3: Extract title
+        print(f"⚠️ validate_doc failed: {e}")
+        return {}
+    print(f"✅ Document validation complete")
+    return {
+        "document_info": DocumentInfo(
+            title=(result["metadata"].get("title") or None) if _skip_vision(state, config) else None,
+            publication_date=result["metadata"].get("publication_date"),
+        )
+    }
+
+
+async def extract_title(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Dict[str, Any]:
+    """Extract the document title from the first page with the vision model."""
     try:
-        await extract_title_tool(pdf_path=pdf_path, state=state, config=config)
-        print(f"✅ Title extracted: {state.document_info.title if state.document_info else 'None'}")
+        title = await _cached_extraction(
+            "extract_title", state, config,
+            lambda: asyncio.to_thread(extract_title_with_vision, state.document_path, config),
+            models=(Configuration.from_runnable_config(config).vision_model,),
+        )
     except Exception as e:
-        print(f"⚠️ extract_title_tool failed: {e}")
-    
-    # Step 4: Extract TOC
+        print(f"⚠️ extract_title failed: {e}")
+        return {}
+    print(f"✅ Title extracted: {title}")
+    return {"document_info": DocumentInfo(title=title)}
+
+
+async def extract_toc(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Dict[str, Any]:
+    """Locate the table of contents pages and extract their entries."""
+    pdf_path = state.document_path
+
+    async def compute() -> List[Dict]:
+        toc_pages = await asyncio.to_thread(find_toc_pages, pdf_path)
+        return await extract_toc_from_pages_with_vision(pdf_path, toc_pages, config)
+
     try:
-        await extract_toc_tool(pdf_path=pdf_path, state=state, config=config)
-        toc_count = len(state.document_structure.table_of_contents) if state.document_structure and state.document_structure.table_of_contents else 0
-        print(f"✅ TOC extracted: {toc_count} entries")
+        toc_entries = await _cached_extraction(
+            "extract_toc", state, config, compute,
+            models=(Configuration.from_runnable_config(config).vision_model,),
+        )
     except Exception as e:
-        print(f"⚠️ extract_toc_tool failed: {e}")
-    
-    # Step 5: Extract references
+        print(f"⚠️ extract_toc failed: {e}")
+        return {}
+    print(f"✅ TOC extracted: {len(toc_entries)} entries")
+    return {"document_structure": DocumentStructure(table_of_contents=toc_entries)}
+
+
+async def extract_references(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Dict[str, Any]:
+    """Extract and parse the bibliography/references section."""
+    configuration = Configuration.from_runnable_config(config)
     try:
-        await extract_references_tool(pdf_path=pdf_path, state=state, config=config)
-        ref_count = len(state.document_structure.references) if state.document_structure and state.document_structure.references else 0
-        print(f"✅ References extracted: {ref_count} entries")
+        references = await _cached_extraction(
+            "extract_references", state, config,
+            lambda: asyncio.to_thread(extract_bibliography_full_pipeline, state.document_path, config),
+            models=(configuration.vision_model, configuration.bibliography_model, configuration.bibliography_model_fallback),
+        )
     except Exception as e:
-        print(f"⚠️ extract_references_tool failed: {e}")
-    
-    
-    state.processing_stage = "document_analysis_complete"
-    print("🎉 Document analysis completed successfully!")
-    return state
+        print(f"⚠️ extract_references failed: {e}")
+        return {}
+    print(f"✅ References extracted: {len(references)} entries")
+    return {"document_structure": DocumentStructure(references=references)}
+
+
+async def extract_tables(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Dict[str, Any]:
+    """Scan the document for tables with pdfplumber."""
+    try:
+        tables = await asyncio.to_thread(extract_all_tables_from_pdf, state.document_path, None, config)
+    except Exception as e:
+        print(f"⚠️ extract_tables failed: {e}")
+        return {}
+    return {"document_structure": DocumentStructure(tables=tables)}
+
+
+# Independent analysis nodes; each writes its own slice of DocumentInfo/DocumentStructure
+ANALYSIS_NODES = {
+    "extract_metadata": extract_metadata,
+    "validate_doc": validate_doc,
+    "extract_title": extract_title,
+    "extract_toc": extract_toc,
+    "extract_references": extract_references,
+    "extract_tables": extract_tables,
+}
+
+
+def route_analysis(
+    state: State, *, config: Optional[RunnableConfig] = None
+) -> Union[str, List[Send]]:
+    """Fan the document out to the analysis nodes, or skip straight to the results."""
+    if state.processing_stage != "document_analysis":
+        return "finalize_results"
+    nodes = list(ANALYSIS_NODES)
+    if not state.topic:
+        nodes.remove("extract_metadata")
+    if not Configuration.from_runnable_config(config).extract_tables:
+        nodes.remove("extract_tables")
+    if _skip_vision(state, config):
+        print("⚠️ Document exceeds vision_max_file_size_mb, skipping vision title/TOC extraction")
+        nodes.remove("extract_title")
+        nodes.remove("extract_toc")
+    return [Send(name, state) for name in nodes]
 
 
 async def finalize_results(
     state: State, *, config: Optional[RunnableConfig] = None
 ) -> Dict[str, Any]:
-    """Prepare final results for output."""
+    """Prepare final results for output.
+
+    This is the join point for the parallel analysis nodes.
+    """
+    processing_stage = state.processing_stage
+    if processing_stage == "document_analysis":
+        processing_stage = "document_analysis_complete"
+        print("🎉 Document analysis completed successfully!")
     
     # Create a comprehensive summary of extracted information
+    document_info = state.document_info
+    document_structure = state.document_structure
     results = {
         "document_info": {
-            "path": state.document_info.path if state.document_info else None,
-            "title": state.document_info.title if state.document_info else None,
-            "file_type": state.document_info.file_type if state.document_info else None,
-            "page_count": state.document_info.page_count if state.document_info else None,
-            "publication_date": state.document_info.publication_date if state.document_info else None,
-            "metadata": state.document_info.metadata if state.document_info else None,
+            key: getattr(document_info, key)
+            for key in ("path", "title", "file_type", "page_count", "publication_date", "metadata")
         },
         "document_structure": {
-            "table_of_contents": state.document_structure.table_of_contents if state.document_structure else None,
-            "references": state.document_structure.references if state.document_structure else None,
-            "tables": state.document_structure.tables if state.document_structure else None,
+            key: getattr(document_structure, key)
+            for key in ("table_of_contents", "references", "tables")
         },
-        "processing_stage": state.processing_stage,
+        "processing_stage": processing_stage,
         "user_topic": state.topic,
     }
     
@@ -107,12 +284,16 @@ workflow = StateGraph(
 )
 
 # Add nodes
-workflow.add_node("document_analysis", document_analysis)
+workflow.add_node("prepare_document", prepare_document)
+for name, node in ANALYSIS_NODES.items():
+    workflow.add_node(name, node)
 workflow.add_node("finalize_results", finalize_results)
 
 # Add edges
-workflow.add_edge("__start__", "document_analysis")
-workflow.add_edge("document_analysis", "finalize_results")
+workflow.add_edge("__start__", "prepare_document")
+workflow.add_conditional_edges("prepare_document", route_analysis, [*ANALYSIS_NODES, "finalize_results"])
+for name in ANALYSIS_NODES:
+    workflow.add_edge(name, "finalize_results")
 workflow.add_edge("finalize_results", "__end__")
 
 # Compile the graph
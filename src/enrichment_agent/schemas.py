@@ -0,0 +1,41 @@
+"""Structured output schemas for the LLM extraction calls.
+
+Passed to ``with_structured_output`` so the provider enforces the response
+shape instead of us parsing free-form JSON out of the reply.
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class TOCEntry(BaseModel):
+    """A single table of contents entry."""
+
+    title: str = Field(description="The section/chapter name, without connecting dots or the page number.")
+    page: int = Field(description="The page number shown for the entry.")
+    level: int = Field(description="Hierarchy level from indentation: 1 = main section, 2 = subsection, etc.")
+    source_page: Optional[int] = Field(
+        default=None,
+        description="When several pages are given, the PDF page number of the image the entry appears on.",
+    )
+
+
+class TableOfContents(BaseModel):
+    """All table of contents entries visible on the given page(s)."""
+
+    entries: List[TOCEntry]
+
+
+class BibliographyEntry(BaseModel):
+    """A single bibliography/reference entry."""
+
+    name: str = Field(description="The title/name of the work or source.")
+    year: str = Field(default="", description="Publication year, or an empty string if not available.")
+    link: str = Field(default="", description="Any URL/link found, or an empty string if not available.")
+
+
+class Bibliography(BaseModel):
+    """All bibliography entries found in the text."""
+
+    entries: List[BibliographyEntry]
@@ -5,14 +5,57 @@ data model used internally by the graph.
 """
 
 import operator
-from dataclasses import dataclass, field
-from typing import Annotated, Any, List, Optional
+from dataclasses import dataclass, field, fields, replace
+from typing import Annotated, Any, List, Optional, TypeVar
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, ToolMessage
 from langgraph.graph import add_messages
 
+_T = TypeVar("_T")
 
-@dataclass(kw_only=True)
+
+def merge_fields(left: Optional[_T], right: Optional[_T]) -> Optional[_T]:
+    """Merge two partial dataclass updates field by field.
+
+    Fields set on ``right`` win; fields left as ``None`` keep the value from
+    ``left``. This lets parallel nodes each fill in their own slice of
+    ``DocumentInfo``/``DocumentStructure`` without clobbering one another.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    updates = {
+        f.name: getattr(right, f.name)
+        for f in fields(right)
+        if getattr(right, f.name) is not None
+    }
+    return replace(left, **updates)
+
+
+MAX_MESSAGE_WINDOW = 20
+"Number of most recent messages kept in State.messages."
+
+
+def window_messages(
+    left: List[BaseMessage], right: Any, *, max_keep: int = MAX_MESSAGE_WINDOW
+) -> List[BaseMessage]:
+    """Merge messages like ``add_messages``, keeping only the newest ``max_keep``.
+
+    Tool messages left at the front of the window after their AI tool call was
+    trimmed away are dropped as well, so the history stays valid for providers.
+    """
+    merged = add_messages(left, right)
+    if len(merged) <= max_keep:
+        return merged
+    window = merged[-max_keep:]
+    start = 0
+    while start < len(window) and isinstance(window[start], ToolMessage):
+        start += 1
+    return window[start:]
+
+
+@dataclass(kw_only=True, slots=True)
 class DocumentInfo:
     """Basic document metadata and content."""
     path: Optional[str] = None                 # File path
@@ -20,18 +63,21 @@ class DocumentInfo:
     title: Optional[str] = None                # Document title
     publication_date: Optional[str] = None     # When published
     page_count: Optional[int] = None           # Number of pages
+    file_size: Optional[int] = None            # File size in bytes
+    content_hash: Optional[str] = None         # SHA-256 of the file, set when the extraction cache is enabled
     metadata: Optional[dict] = None            # Extracted metadata from user query
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class DocumentStructure:
     """Document structure and formatting details."""
     table_of_contents: Optional[List[dict]] = None  # [{title, page, level}]
     references: Optional[List[dict]] = None    # [{name, year, link}]
     tables: Optional[dict] = None              # {page_num: [table_data]}
+    tables_text_analysis: Optional[dict] = None  # {page_num: [table_data]} from text-pattern detection
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class InputState:
     """Input state defines the interface between the graph and the user (external API)."""
 
@@ -48,7 +94,7 @@ class InputState:
     "Path to the document to be analyzed and updated."
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class State(InputState):
     """A graph's State defines three main things.
 
@@ -58,7 +104,7 @@ class State(InputState):
     See [Reducers](https://langchain-ai.github.io/langgraph/concepts/low_level/#reducers) for more information.
     """
 
-    messages: Annotated[List[BaseMessage], add_messages] = field(default_factory=list)
+    messages: Annotated[List[BaseMessage], window_messages] = field(default_factory=list)
     """
     Messages track the primary execution state of the agent.
 
@@ -86,15 +132,18 @@ class State(InputState):
         A new list of messages with the messages from `right` merged into `left`.
         If a message in `right` has the same ID as a message in `left`, the
         message from `right` will replace the message from `left`.
+
+    Only the most recent MAX_MESSAGE_WINDOW messages are kept, so long runs
+    don't grow the prompt (and checkpoints) without bound.
         """
 
     loop_step: Annotated[int, operator.add] = field(default=0)
 
     # Document understanding components
-    document_info: Optional[DocumentInfo] = field(default=None)
+    document_info: Annotated[DocumentInfo, merge_fields] = field(default_factory=DocumentInfo)
     "Basic document metadata and extracted content."
     
-    document_structure: Optional[DocumentStructure] = field(default=None)
+    document_structure: Annotated[DocumentStructure, merge_fields] = field(default_factory=DocumentStructure)
     "Document structure including TOC, references, and tables."
     
     # Processing status
@@ -102,7 +151,7 @@ class State(InputState):
     "Current processing stage: start, document_analysis_complete, etc."
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class OutputState:
     """The response object for the end user.
 
@@ -5,7 +5,9 @@ These tools can be used for tasks such as web searching and scraping.
 Users can edit and extend these tools as needed.
 """
 
-import json
+import asyncio
+import string
+from collections import OrderedDict
 from typing import Any, Optional, cast
 
 import aiohttp
@@ -16,19 +18,20 @@ from langgraph.prebuilt import InjectedState
 from typing_extensions import Annotated
 
 from enrichment_agent.configuration import Configuration
-from enrichment_agent.state import State, DocumentInfo, DocumentStructure
+from enrichment_agent.state import State
 from enrichment_agent.utils import (
-    validate_document,
-    extract_title_with_vision,
-    find_toc_pages,
-    extract_toc_from_page_with_vision,
+    _json_dumps,
+    detect_tables_by_text_analysis,
+    extract_all_tables_from_pdf,
     extract_bibliography_full_pipeline,
+    extract_metadata_from_user_query,
     extract_tables_from_page,
-    extract_all_tables_from_pdf,
-    detect_tables_by_text_analysis,
-    init_model,
+    extract_title_with_vision,
+    extract_toc_from_pages_with_vision,
+    find_toc_pages,
     generate_search_query,
-    extract_metadata_from_user_query
+    init_model,
+    validate_document,
 )
 
 
@@ -46,19 +49,90 @@ async def search(
     return cast(list[dict[str, Any]], result)
 
 
-_INFO_PROMPT = """You are doing web research on behalf of a user. You are trying to find out this information:
+# Upper bound on concurrent fetches in scrape_websites, and on the total page content sent to the model
+_MAX_CONCURRENT_SCRAPES = 5
+_MAX_SCRAPED_CHARS = 40_000
+
+# Shared HTTP sessions, one per event loop, so keep-alive connections and DNS lookups are reused
+_HTTP_SESSIONS: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+async def _get_http_session() -> aiohttp.ClientSession:
+    """Return the running loop's shared HTTP session, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    session = _HTTP_SESSIONS.get(loop)
+    if session is None or session.closed:
+        # Sessions of loops that already shut down can never be used again; close them so they are not left dangling
+        for stale_loop in [other for other in _HTTP_SESSIONS if other.is_closed()]:
+            await _HTTP_SESSIONS.pop(stale_loop).close()
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=10, keepalive_timeout=30, ttl_dns_cache=300)
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=15))
+        _HTTP_SESSIONS[loop] = session
+    return session
+
+
+async def _fetch_text(url: str, max_chars: int) -> str:
+    """Fetch a page and return at most max_chars characters of it, without buffering the whole body."""
+    # UTF-8 uses at most 4 bytes per character, so this many bytes always covers max_chars
+    max_bytes = max_chars * 4
+    buffer = bytearray()
+    async with (await _get_http_session()).get(url) as response:
+        async for chunk in response.content.iter_chunked(16_384):
+            buffer.extend(chunk)
+            if len(buffer) >= max_bytes:
+                break
+        encoding = response.charset or "utf-8"
+    try:
+        text = buffer.decode(encoding, errors="replace")
+    except LookupError:  # unknown charset advertised by the server
+        text = buffer.decode("utf-8", errors="replace")
+    return text[:max_chars]
+
+
+async def close_http_session() -> None:
+    """Close every shared HTTP session, each on the event loop it belongs to."""
+    current = asyncio.get_running_loop()
+    for loop in list(_HTTP_SESSIONS):
+        session = _HTTP_SESSIONS.pop(loop)
+        if loop is current or loop.is_closed() or not loop.is_running():
+            await session.close()
+        else:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+
+
+# Serialized extraction schemas keyed by id(); the schema object is kept alongside so the id cannot be reused
+_SCHEMA_JSON_CACHE: "OrderedDict[int, tuple[Any, str]]" = OrderedDict()
+_SCHEMA_JSON_CACHE_SIZE = 8
+
+
+def _schema_json(schema: Any) -> str:
+    """Serialize the extraction schema for a prompt, reusing the string for the same schema object."""
+    key = id(schema)
+    entry = _SCHEMA_JSON_CACHE.get(key)
+    if entry is not None and entry[0] is schema:
+        _SCHEMA_JSON_CACHE.move_to_end(key)
+        return entry[1]
+    text = _json_dumps(schema, indent=True).decode()
+    _SCHEMA_JSON_CACHE[key] = (schema, text)
+    _SCHEMA_JSON_CACHE.move_to_end(key)
+    while len(_SCHEMA_JSON_CACHE) > _SCHEMA_JSON_CACHE_SIZE:
+        _SCHEMA_JSON_CACHE.popitem(last=False)
+    return text
+
+
+_INFO_PROMPT = string.Template("""You are doing web research on behalf of a user. You are trying to find out this information:
 
 <info>
-{info}
+${info}
 </info>
 
-You just scraped the following website: {url}
+You just scraped the following website: ${url}
 
 Based on the website content below, jot down some notes about the website.
 
 <Website content>
-{content}
-</Website content>"""
+${content}
+</Website content>""")
 
 
 async def scrape_website(
@@ -72,14 +146,62 @@ async def scrape_website(
     Returns:
         str: A summary of the scraped content, tailored to the extraction schema.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            content = await response.text()
+    content = await _fetch_text(url, _MAX_SCRAPED_CHARS)
 
-    p = _INFO_PROMPT.format(
-        info=json.dumps(state.extraction_schema, indent=2),
+    p = _INFO_PROMPT.substitute(
+        info=_schema_json(state.extraction_schema),
         url=url,
-        content=content[:40_000],
+        content=content,
+    )
+    raw_model = init_model(config)
+    result = await raw_model.ainvoke(p)
+    return str(result.content)
+
+
+_BATCH_INFO_PROMPT = string.Template("""You are doing web research on behalf of a user. You are trying to find out this information:
+
+<info>
+${info}
+</info>
+
+You just scraped the following websites. Based on the content of each website below, jot down some notes about it, \
+stating which URL each note comes from.
+
+${pages}""")
+
+
+async def scrape_websites(
+    urls: list[str],
+    *,
+    state: Annotated[State, InjectedState],
+    config: Annotated[RunnableConfig, InjectedToolArg],
+) -> str:
+    """Scrape several URLs at once and summarize them together.
+
+    Prefer this over calling scrape_website repeatedly when there are multiple pages to read.
+
+    Returns:
+        str: Notes on the scraped content of every URL, tailored to the extraction schema.
+    """
+    if not urls:
+        return "No URLs given."
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_SCRAPES)
+    per_page = max(4_000, _MAX_SCRAPED_CHARS // len(urls))
+
+    async def fetch(url: str) -> str:
+        async with semaphore:
+            return await _fetch_text(url, per_page)
+
+    contents = await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+    pages = "\n\n".join(
+        f'<page url="{url}">\n'
+        + (f"Failed to fetch: {content}" if isinstance(content, BaseException) else content)
+        + "\n</page>"
+        for url, content in zip(urls, contents)
+    )
+    p = _BATCH_INFO_PROMPT.substitute(
+        info=_schema_json(state.extraction_schema),
+        pages=pages,
     )
     raw_model = init_model(config)
     result = await raw_model.ainvoke(p)
@@ -89,13 +211,15 @@ async def scrape_website(
 async def validate_document_tool(
     *,
     pdf_path: str,
+    deep: bool = False,
     state: Annotated[State, InjectedState],
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
-    """Validate a PDF document and update state with basic metadata."""
-    result = validate_document(pdf_path)
-    if not state.document_info:
-        state.document_info = DocumentInfo()
+    """Validate a PDF document and update state with basic metadata.
+
+    Set deep to also check the first page's text for signs of a scanned document.
+    """
+    result = await asyncio.to_thread(validate_document, pdf_path, deep)
     state.document_info.path = pdf_path
     state.document_info.file_type = "PDF"
     state.document_info.title = result["metadata"].get("title")
@@ -105,13 +229,19 @@ async def validate_document_tool(
 async def extract_title_tool(
     *,
     pdf_path: str,
+    force: bool = False,
     state: Annotated[State, InjectedState],
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
-    """Extract document title using vision model and update state."""
-    title = extract_title_with_vision(pdf_path, config)
-    if not state.document_info:
-        state.document_info = DocumentInfo()
+    """Extract document title using vision model and update state.
+
+    If a title is already known for this document (e.g. from its PDF metadata via
+    validate_document_tool), it is returned without a vision call unless force is set.
+    """
+    document_info = state.document_info
+    if not force and document_info.title and document_info.path == pdf_path:
+        return {"title": document_info.title, "cached": True}
+    title = await asyncio.to_thread(extract_title_with_vision, pdf_path, config)
     state.document_info.title = title
     return {"title": title}
 
@@ -122,12 +252,8 @@ async def extract_toc_tool(
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
     """Extract table of contents and update state."""
-    toc_pages = find_toc_pages(pdf_path)
-    toc_entries = []
-    for page in toc_pages:
-        toc_entries.extend(extract_toc_from_page_with_vision(pdf_path, page, config))
-    if not state.document_structure:
-        state.document_structure = DocumentStructure()
+    toc_pages = await asyncio.to_thread(find_toc_pages, pdf_path)
+    toc_entries = await extract_toc_from_pages_with_vision(pdf_path, toc_pages, config)
     state.document_structure.table_of_contents = toc_entries
     return {"toc": toc_entries}
 
@@ -138,9 +264,7 @@ async def extract_references_tool(
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
     """Extract references/bibliography and update state."""
-    references = extract_bibliography_full_pipeline(pdf_path, config)
-    if not state.document_structure:
-        state.document_structure = DocumentStructure()
+    references = await asyncio.to_thread(extract_bibliography_full_pipeline, pdf_path, config)
     state.document_structure.references = references
     return {"references": references}
 
@@ -152,10 +276,8 @@ async def extract_tables_tool(
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
     """Extract tables from a specific page and update state."""
-    tables = extract_tables_from_page(pdf_path, page_num)
-    if not state.document_structure:
-        state.document_structure = DocumentStructure()
-    if not hasattr(state.document_structure, 'tables'):
+    tables = await asyncio.to_thread(extract_tables_from_page, pdf_path, page_num)
+    if state.document_structure.tables is None:
         state.document_structure.tables = {}
     state.document_structure.tables[page_num] = tables
     return {"tables": tables, "page": page_num}
@@ -168,9 +290,7 @@ async def extract_all_tables_tool(
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
     """Extract all tables from the PDF and update state."""
-    all_tables = extract_all_tables_from_pdf(pdf_path, max_pages)
-    if not state.document_structure:
-        state.document_structure = DocumentStructure()
+    all_tables = await asyncio.to_thread(extract_all_tables_from_pdf, pdf_path, max_pages, config)
     state.document_structure.tables = all_tables
     total_tables = sum(len(tables) for tables in all_tables.values())
     return {"all_tables": all_tables, "total_tables": total_tables}
@@ -184,10 +304,8 @@ async def detect_tables_text_analysis_tool(
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
     """Detect tables using text analysis as a fallback method and update state."""
-    tables = detect_tables_by_text_analysis(pdf_path, page_num, min_columns)
-    if not state.document_structure:
-        state.document_structure = DocumentStructure()
-    if not hasattr(state.document_structure, 'tables_text_analysis'):
+    tables = await asyncio.to_thread(detect_tables_by_text_analysis, pdf_path, page_num, min_columns)
+    if state.document_structure.tables_text_analysis is None:
         state.document_structure.tables_text_analysis = {}
     state.document_structure.tables_text_analysis[page_num] = tables
     return {"tables": tables, "page": page_num, "method": "text_analysis"}
@@ -199,9 +317,7 @@ async def extract_metadata_from_query_tool(
     config: Annotated[RunnableConfig, InjectedToolArg],
 ) -> dict:
     """Extract metadata from user query and update state."""
-    metadata = extract_metadata_from_user_query(user_query)
-    if not state.document_info:
-        state.document_info = DocumentInfo()
+    metadata = await asyncio.to_thread(extract_metadata_from_user_query, user_query, config)
     state.document_info.metadata = metadata
     return {"metadata": metadata}
 
@@ -1,32 +1,126 @@
 """Utility functions for document processing."""
 
-import base64
+import asyncio
+import copy
+import hashlib
+import io
 import json
+import logging
+import multiprocessing
 import os
 import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
-
-import fitz
+from functools import cache, lru_cache, partial, wraps
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List, Optional, Union
 
 from langchain.chat_models import init_chat_model
+from langchain_core.caches import BaseCache
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AnyMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 
-from enrichment_agent.configuration import Configuration
 from enrichment_agent import prompts
+from enrichment_agent.configuration import Configuration
+from enrichment_agent.schemas import Bibliography, TableOfContents
+
+if TYPE_CHECKING:
+    # PyMuPDF is imported where it is used, so importing this module does not pay for it
+    import fitz
+
+logger = logging.getLogger(__name__)
+
+# Set ENRICHMENT_LOAD_DOTENV=0 to skip reading .env (e.g. when the environment is already configured)
+if os.environ.get("ENRICHMENT_LOAD_DOTENV", "1") == "1":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+        logger.debug(
+            "Environment loaded. ANTHROPIC_API_KEY: %s, OPENAI_API_KEY: %s",
+            "ANTHROPIC_API_KEY" in os.environ, "OPENAI_API_KEY" in os.environ,
+        )
+    except ImportError:
+        logger.debug("python-dotenv not available, skipping .env loading")
+
+try:
+    # SIMD-accelerated base64; page images are encoded on every vision call
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
 
 try:
-    from dotenv import load_dotenv
-    load_dotenv()
-    print(f"🔑 Environment loaded. ANTHROPIC_API_KEY: {'ANTHROPIC_API_KEY' in os.environ}, OPENAI_API_KEY: {'OPENAI_API_KEY' in os.environ}")
+    import orjson
+
+    def _json_loads(data: Any) -> Any:
+        return orjson.loads(data)
+
+    def _json_dumps(value: Any, indent: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, default=str, option=option)
 except ImportError:
-    print("⚠️ python-dotenv not available, skipping .env loading")
+    def _json_loads(data: Any) -> Any:
+        return json.loads(data)
+
+    def _json_dumps(value: Any, indent: bool = False) -> bytes:
+        return json.dumps(value, default=str, indent=2 if indent else None).encode("utf-8")
+
+
+# Page headers written by extract_bibliography_text_from_toc, used to split the text into parse chunks
+_PAGE_MARKER_RE = re.compile(r"^(?==== PAGE \d+ ===$)", re.MULTILINE)
+# Longest page tail (in lines) carried into the next parse chunk; one reference rarely runs longer
+_MAX_CARRIED_LINES = 8
+# Keywords marking a Table of Contents page (matched anywhere in the page text, like the original substring checks)
+_TOC_KEYWORD_RE = re.compile(r"table of contents|contents|toc", re.IGNORECASE)
+# TOC entry titles that mark the bibliography section (whole words, so e.g. "Water Resources" does not match)
+_BIBLIOGRAPHY_TITLE_RE = re.compile(
+    r"\b(?:references|bibliography|works cited|literature cited|sources|citations)\b", re.IGNORECASE
+)
+# Four-digit years, stripped from reference names when building search queries
+_YEAR_RE = re.compile(r"\b(?:20\d{2}|19\d{2})\b")
+
+def _memoize_per_file(maxsize: int = 32):
+    """
+    Memoize a function whose first argument is a file path, keyed on the path and the file's mtime/size.
+    """
+    def decorator(func):
+        # mtime/size are part of the key, so rewriting the file invalidates its entries
+        @lru_cache(maxsize=maxsize)
+        def cached(path, mtime_ns, size, *args, **kwargs):
+            return func(path, *args, **kwargs)
+
+        @wraps(func)
+        def wrapper(path, *args, **kwargs):
+            try:
+                stat = os.stat(path)
+            except (OSError, TypeError, ValueError):
+                return func(path, *args, **kwargs)
+            # Callers get their own copy, so mutating a result cannot corrupt the cache
+            return copy.deepcopy(cached(path, stat.st_mtime_ns, stat.st_size, *args, **kwargs))
 
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return decorator
 
+# Lets a caller that makes several passes over one PDF open it once and hand it to each helper
+@contextmanager
+def _open_pdf(source: Union[str, "fitz.Document"]) -> Iterator["fitz.Document"]:
+    """
+    Yield an open document for a path (closed on exit), or pass an already open document through untouched.
+    """
+    import fitz
+    if isinstance(source, fitz.Document):
+        yield source
+        return
+    with fitz.open(source) as doc:
+        yield doc
 
-def validate_document(pdf_path: str) -> Dict[str, any]:
+@_memoize_per_file()
+def validate_document(pdf_path: str, deep: bool = False) -> Dict[str, any]:
     """
     Validate a PDF document before parsing. Returns validation results and metadata.
     """
@@ -44,34 +138,80 @@ def validate_document(pdf_path: str) -> Dict[str, any]:
         validation_result["metadata"]["file_size_mb"] = round(file_size / (1024 * 1024), 2)
         if file_size > 50 * 1024 * 1024:
             validation_result["warnings"].append(f"Large file size: {validation_result['metadata']['file_size_mb']}MB")
-        doc = fitz.open(pdf_path)
-        page_count = len(doc)
-        validation_result["metadata"]["page_count"] = page_count
-        if page_count == 0:
-            validation_result["errors"].append("PDF has no pages")
-            doc.close()
-            return validation_result
-        first_page = doc[0]
-        test_text = first_page.get_text()
-        validation_result["metadata"]["first_page_char_count"] = len(test_text)
-        if len(test_text.strip()) < 10:
-            validation_result["warnings"].append("Very little text on first page - may be scanned/image-based")
-        try:
-            metadata = doc.metadata
-            validation_result["metadata"]["title"] = metadata.get("title", "")
-            validation_result["metadata"]["author"] = metadata.get("author", "")
-        except:
-            validation_result["warnings"].append("Could not access document metadata")
-        doc.close()
+        import fitz
+        with _open_pdf(pdf_path) as doc:
+            page_count = len(doc)
+            validation_result["metadata"]["page_count"] = page_count
+            if page_count == 0:
+                validation_result["errors"].append("PDF has no pages")
+                return validation_result
+            # Reading text is the expensive part, so the scanned-document check only runs when deep is set;
+            # plain text without layout work is enough for the "little text" heuristic
+            if deep:
+                test_text = doc[0].get_text("text", flags=fitz.TEXT_INHIBIT_SPACES | fitz.TEXT_MEDIABOX_CLIP)
+                validation_result["metadata"]["first_page_char_count"] = len(test_text)
+                if len(test_text.strip()) < 10:
+                    validation_result["warnings"].append("Very little text on first page - may be scanned/image-based")
+            try:
+                metadata = doc.metadata
+                validation_result["metadata"]["title"] = metadata.get("title", "")
+                validation_result["metadata"]["author"] = metadata.get("author", "")
+            except:
+                validation_result["warnings"].append("Could not access document metadata")
         validation_result["is_valid"] = True
-        print(f"✅ Document validation passed: {page_count} pages, {validation_result['metadata']['first_page_char_count']} chars on page 1")
+        logger.debug("✅ Document validation passed: %s pages", page_count)
         if validation_result["warnings"]:
-            print(f"⚠️ Warnings: {', '.join(validation_result['warnings'])}")
+            logger.warning("⚠️ Warnings: %s", ', '.join(validation_result['warnings']))
     except Exception as e:
         validation_result["errors"].append(f"PDF validation failed: {str(e)}")
-        print(f"Document validation failed: {str(e)}")
+        logger.error("❌ Document validation failed: %s", e)
     return validation_result
 
+def compute_file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in fixed-size chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_extraction_cache(cache_dir: str, digest: str, name: str) -> Optional[Any]:
+    """
+    Load a cached extraction result for a document digest, or None on a miss.
+    """
+    path = os.path.join(cache_dir, digest, f"{name}.json")
+    try:
+        with open(path, "rb") as f:
+            return _json_loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("⚠️ Ignoring unreadable cache entry %s: %s", path, e)
+        return None
+
+def store_extraction_cache(cache_dir: str, digest: str, name: str, value: Any) -> None:
+    """
+    Store an extraction result for a document digest (written atomically).
+    """
+    directory = os.path.join(cache_dir, digest)
+    path = os.path.join(directory, f"{name}.json")
+    tmp_path = f"{path}.tmp"
+    try:
+        # Serialize first, so an unserializable result never leaves a partial file behind
+        data = _json_dumps(value)
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:  # orjson.JSONEncodeError is a TypeError
+        logger.warning("⚠️ Could not write cache entry %s: %s", path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
 def get_message_text(msg: AnyMessage) -> str:
     """Return the text content of a message."""
     content = msg.content
@@ -83,57 +223,159 @@ def get_message_text(msg: AnyMessage) -> str:
         txts = [c if isinstance(c, str) else (c.get("text") or "") for c in content]
         return "".join(txts).strip()
 
-def init_model(config: Optional[RunnableConfig] = None) -> BaseChatModel:
-    """Initialize the main language model for the agent."""
-    configuration = Configuration.from_runnable_config(config)
-    fully_specified_name = configuration.model
+@cache
+def get_llm_cache(database_path: Optional[str]) -> Optional[BaseCache]:
+    """Return the shared SQLite LLM response cache for a path, or None when caching is disabled."""
+    if not database_path:
+        return None
+    from langchain_community.cache import SQLiteCache
+    return SQLiteCache(database_path=database_path)
+
+# Constructor kwargs holding option dicts that extra_model_kwargs extends rather than replaces
+_MERGED_MODEL_KWARGS = ("model_kwargs", "default_headers")
+
+def get_model_kwargs(provider: Optional[str], configuration: Configuration) -> Dict[str, Any]:
+    """Return the provider-specific constructor kwargs shared by every chat model we build."""
+    kwargs: Dict[str, Any] = {"cache": get_llm_cache(configuration.llm_cache_path)}
+    if configuration.use_prompt_caching and provider == "anthropic":
+        kwargs["default_headers"] = {"anthropic-beta": "prompt-caching-2024-07-31"}
+    if configuration.latency_optimized:
+        if provider in ("bedrock", "bedrock_converse"):
+            kwargs["model_kwargs"] = {"performanceConfig": {"latency": "optimized"}}
+        elif provider == "openai":
+            kwargs["service_tier"] = "priority"
+    for key, value in configuration.extra_model_kwargs.items():
+        # Nested option dicts are merged, so e.g. user model_kwargs keep the latency setting above
+        if key in _MERGED_MODEL_KWARGS and isinstance(kwargs.get(key), dict) and isinstance(value, dict):
+            kwargs[key] = {**kwargs[key], **value}
+        else:
+            kwargs[key] = value
+    return kwargs
+
+_MODEL_CACHE: Dict[Any, BaseChatModel] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+def _freeze(value: Any) -> Any:
+    """Convert nested dicts/lists into hashable tuples for use in a cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def init_model_by_name(fully_specified_name: str, configuration: Configuration) -> BaseChatModel:
+    """Initialize a chat model from a provider/model-name string with the shared model kwargs.
+
+    Clients are cached per (model, kwargs), so their HTTP connection pools are reused across calls.
+    """
     if "/" in fully_specified_name:
         provider, model = fully_specified_name.split("/", maxsplit=1)
     else:
         provider = None
         model = fully_specified_name
-    return init_chat_model(model, model_provider=provider)
+    kwargs = get_model_kwargs(provider, configuration)
+    key = (provider, model, _freeze(kwargs))
+    try:
+        hash(key)
+    except TypeError:
+        return init_chat_model(model, model_provider=provider, **kwargs)
+    with _MODEL_CACHE_LOCK:
+        chat_model = _MODEL_CACHE.get(key)
+        if chat_model is None:
+            chat_model = _MODEL_CACHE[key] = init_chat_model(model, model_provider=provider, **kwargs)
+    return chat_model
+
+def init_model(config: Optional[RunnableConfig] = None) -> BaseChatModel:
+    """Initialize the main language model for the agent."""
+    configuration = Configuration.from_runnable_config(config)
+    return init_model_by_name(configuration.model, configuration)
+
+# Vision models whose API-key diagnostics have already been logged
+_REPORTED_VISION_MODELS: set = set()
 
 def init_vision_model(config: Optional[RunnableConfig] = None) -> BaseChatModel:
     """Initialize a vision-capable model for visual document analysis."""
     configuration = Configuration.from_runnable_config(config)
     model_name = configuration.vision_model
-    api_key_present = False
-    if "anthropic" in model_name.lower():
-        api_key_present = bool(os.environ.get("ANTHROPIC_API_KEY"))
-        print(f"🔍 Anthropic API key present: {api_key_present}")
-        if not api_key_present:
-            print("💡 Tip: Set ANTHROPIC_API_KEY in your .env file")
-    elif "openai" in model_name.lower():
-        api_key_present = bool(os.environ.get("OPENAI_API_KEY"))
-        print(f"🔍 OpenAI API key present: {api_key_present}")
-        if not api_key_present:
-            print("💡 Tip: Set OPENAI_API_KEY in your .env file")
-    if "/" in model_name:
-        provider, model = model_name.split("/", maxsplit=1)
-    else:
-        provider = None
-        model = model_name
-    print(f"🤖 Initializing vision model: {model_name}")
-    return init_chat_model(model, model_provider=provider)
+    if model_name not in _REPORTED_VISION_MODELS:
+        _REPORTED_VISION_MODELS.add(model_name)
+        if "anthropic" in model_name.lower():
+            api_key_present = bool(os.environ.get("ANTHROPIC_API_KEY"))
+            logger.debug("🔍 Anthropic API key present: %s", api_key_present)
+            if not api_key_present:
+                logger.warning("💡 Tip: Set ANTHROPIC_API_KEY in your .env file")
+        elif "openai" in model_name.lower():
+            api_key_present = bool(os.environ.get("OPENAI_API_KEY"))
+            logger.debug("🔍 OpenAI API key present: %s", api_key_present)
+            if not api_key_present:
+                logger.warning("💡 Tip: Set OPENAI_API_KEY in your .env file")
+        logger.debug("🤖 Initializing vision model: %s", model_name)
+    return init_model_by_name(model_name, configuration)
 
-def extract_first_page_as_image(pdf_path: str, page_num: int = 0) -> bytes:
+def _vision_prompt_block(prompt: str, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
-    Convert the first page of a PDF to PNG image data.
+    Build the text block of a vision request; for Anthropic models it is marked cacheable.
     """
-    if not os.path.exists(pdf_path):
+    configuration = Configuration.from_runnable_config(config)
+    text_block = {"type": "text", "text": prompt}
+    # The prompt is identical on every call, so only the image after it is re-processed
+    if configuration.use_prompt_caching and "anthropic" in configuration.vision_model.lower():
+        text_block["cache_control"] = {"type": "ephemeral"}
+    return text_block
+
+_JPEG_DATA_URI_PREFIX = b"data:image/jpeg;base64,"
+
+def _vision_image_block(image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+    """
+    Build the image block of a vision request from raw JPEG data.
+    """
+    # Assembled as bytes and decoded once, instead of decoding the base64 and formatting a second string
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": (_JPEG_DATA_URI_PREFIX + b64encode(image_data)).decode("ascii")
+        }
+    }
+
+def build_vision_message(prompt: str, image_data: Union[bytes, memoryview], config: Optional[RunnableConfig] = None) -> HumanMessage:
+    """
+    Build a vision request pairing a static prompt with a JPEG page image.
+    """
+    return HumanMessage(content=[_vision_prompt_block(prompt, config), _vision_image_block(image_data)])
+
+def _render_page(page: "fitz.Page", max_dim: int, jpeg_quality: int, out: Optional[BinaryIO] = None) -> Optional[bytes]:
+    """
+    Rasterize a page as JPEG (written into out when given), scaled so its longer side is at most max_dim pixels.
+    """
+    import fitz
+    scale = min(2.0, max_dim / max(page.rect.width, page.rect.height))
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+    # Writing into out avoids an intermediate bytes copy
+    if out is not None:
+        # MuPDF encodes the JPEG itself; pil_save would first convert the pixmap into a PIL image
+        pix.save(out, output="jpeg", jpg_quality=jpeg_quality)
+        return None
+    return pix.tobytes("jpeg", jpg_quality=jpeg_quality)
+
+def _render_to_buffer(render, *args) -> memoryview:
+    """
+    Run one of the page-to-image functions into a BytesIO and return a view of its contents.
+    """
+    buf = io.BytesIO()
+    render(*args, out=buf)
+    return buf.getbuffer()
+
+def extract_first_page_as_image(pdf_path: Union[str, "fitz.Document"], page_num: int = 0, max_dim: int = 1568, jpeg_quality: int = 85, out: Optional[BinaryIO] = None) -> Optional[bytes]:
+    """
+    Convert the first page of a PDF (path or open document) to JPEG image data.
+    """
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
     try:
-        doc = fitz.open(pdf_path)
-        if len(doc) == 0:
-            doc.close()
-            raise ValueError("PDF has no pages")
-        page = doc[page_num]
-        pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
-        image_data = pix.tobytes("png")
-        pix = None
-        doc.close()
-        return image_data
+        with _open_pdf(pdf_path) as doc:
+            if len(doc) == 0:
+                raise ValueError("PDF has no pages")
+            return _render_page(doc[page_num], max_dim, jpeg_quality, out)
     except Exception as e:
         raise ValueError(f"Failed to extract first page as image from {pdf_path}: {str(e)}")
 
@@ -142,23 +384,12 @@ def extract_title_with_vision(pdf_path: str, config: Optional[RunnableConfig] =
     Extract document title using a vision model on the first page image.
     """
     try:
-        image_data = extract_first_page_as_image(pdf_path, 0)
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        vision_model = init_vision_model(config)
-        message = HumanMessage(
-            content=[
-                {
-                    "type": "text",
-                    "text": prompts.VISION_TITLE_EXTRACTION_PROMPT
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{image_base64}"
-                    }
-                }
-            ]
+        configuration = Configuration.from_runnable_config(config)
+        image_data = _render_to_buffer(
+            extract_first_page_as_image, pdf_path, 0, configuration.vision_image_max_dim, configuration.vision_jpeg_quality
         )
+        vision_model = init_vision_model(config)
+        message = build_vision_message(prompts.VISION_TITLE_EXTRACTION_PROMPT, image_data, config)
         response = vision_model.invoke([message])
         title = str(response.content).strip()
         if title and len(title) > 3:
@@ -171,150 +402,262 @@ def extract_title_with_vision(pdf_path: str, config: Optional[RunnableConfig] =
         else:
             return "Untitled Document"
     except Exception as e:
-        print(f"⚠️ Vision title extraction failed: {e}")
+        logger.warning("⚠️ Vision title extraction failed: %s", e)
         return "Untitled Document"
 
-def find_toc_pages(pdf_path: str, max_pages_to_scan: int = 15) -> List[int]:
+@_memoize_per_file()
+def find_toc_pages(pdf_path: Union[str, "fitz.Document"], max_pages_to_scan: int = 15) -> List[int]:
     """
     Find pages containing a Table of Contents using text extraction.
     """
-    if not os.path.exists(pdf_path):
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    import fitz
     toc_pages = []
-    toc_keywords = [
-        'table of contents',
-        'contents', 
-        'toc'
-    ]
     try:
-        doc = fitz.open(pdf_path)
-        pages_to_check = min(max_pages_to_scan, len(doc))
-        for page_num in range(pages_to_check):
-            page = doc[page_num]
-            text = page.get_text().lower()
-            for keyword in toc_keywords:
-                if keyword in text:
-                    page_number_1_based = page_num + 1
-                    if page_number_1_based not in toc_pages:
-                        toc_pages.append(page_number_1_based)
-                        print(f"📖 Found TOC keyword '{keyword}' on page {page_number_1_based}")
-                    break
-        doc.close()
-        return sorted(toc_pages)
+        with _open_pdf(pdf_path) as doc:
+            pages_to_check = min(max_pages_to_scan, len(doc))
+            for page_num in range(pages_to_check):
+                # Plain text without ligature/whitespace preservation is all the keyword scan needs
+                text = doc[page_num].get_text("text", flags=fitz.TEXT_MEDIABOX_CLIP)
+                match = _TOC_KEYWORD_RE.search(text)
+                if match:
+                    toc_pages.append(page_num + 1)
+                    logger.debug("📖 Found TOC keyword '%s' on page %s", match.group(0).lower(), page_num + 1)
+        return toc_pages
     except Exception as e:
-        print(f"❌ Error finding TOC pages: {e}")
+        logger.error("❌ Error finding TOC pages: %s", e)
         return []
 
-def extract_page_as_image(pdf_path: str, page_num: int) -> bytes:
+def extract_page_as_image(pdf_path: Union[str, "fitz.Document"], page_num: int, max_dim: int = 1568, jpeg_quality: int = 85, out: Optional[BinaryIO] = None) -> Optional[bytes]:
     """
-    Convert any page of a PDF to PNG image data.
+    Convert any page of a PDF (path or open document) to JPEG image data.
     """
-    if not os.path.exists(pdf_path):
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
     try:
-        doc = fitz.open(pdf_path)
-        if page_num < 1 or page_num > len(doc):
-            doc.close()
-            raise ValueError(f"Invalid page number {page_num}. Document has {len(doc)} pages.")
-        page = doc[page_num - 1]
-        pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
-        image_data = pix.tobytes("png")
-        pix = None
-        doc.close()
-        return image_data
+        with _open_pdf(pdf_path) as doc:
+            if page_num < 1 or page_num > len(doc):
+                raise ValueError(f"Invalid page number {page_num}. Document has {len(doc)} pages.")
+            return _render_page(doc[page_num - 1], max_dim, jpeg_quality, out)
     except Exception as e:
         raise ValueError(f"Failed to extract page {page_num} as image from {pdf_path}: {str(e)}")
 
-def extract_toc_from_page_with_vision(pdf_path: str, page_num: int, config: Optional[RunnableConfig] = None) -> List[Dict]:
+# Shared process pools keyed by worker count; a pool whose workers died is replaced on the next request
+# Workers come from a forkserver: by the time the pool starts, this process runs LLM and to_thread worker threads,
+# and forking it could hand a worker a lock some other thread held at fork time
+_PROCESS_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_PROCESS_POOLS_LOCK = threading.Lock()
+
+def _get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound PDF work (page rendering, table extraction)."""
+    with _PROCESS_POOLS_LOCK:
+        pool = _PROCESS_POOLS.get(workers)
+        if pool is None:
+            pool = _PROCESS_POOLS[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return pool
+
+def _discard_process_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+    """Forget a broken shared pool (one of its workers died), so the next _get_process_pool call starts a fresh one."""
+    with _PROCESS_POOLS_LOCK:
+        if _PROCESS_POOLS.get(workers) is pool:
+            del _PROCESS_POOLS[workers]
+    pool.shutdown(wait=False)
+
+def _process_pool_map(workers: int, func, *iterables) -> list:
+    """Map func over the shared process pool, rebuilding the pool and retrying once if it is broken."""
+    pool = _get_process_pool(workers)
+    try:
+        return list(pool.map(func, *iterables))
+    except BrokenProcessPool as e:
+        logger.warning("⚠️ PDF worker pool broke (%s), retrying with a fresh pool", e)
+        _discard_process_pool(workers, pool)
+        return list(_get_process_pool(workers).map(func, *iterables))
+
+async def render_pages_as_images(pdf_path: str, page_nums: List[int], config: Optional[RunnableConfig] = None) -> List[Optional[bytes]]:
+    """
+    Rasterize several PDF pages concurrently, returning JPEG data in page order (None for pages that failed to render).
+    """
+    if not page_nums:
+        return []
+    configuration = Configuration.from_runnable_config(config)
+    workers = max(1, configuration.render_workers)
+    render = partial(
+        extract_page_as_image,
+        max_dim=configuration.vision_image_max_dim,
+        jpeg_quality=configuration.vision_jpeg_quality,
+    )
+    loop = asyncio.get_running_loop()
+
+    # PyMuPDF holds the GIL and is not thread-safe, so pages are rendered in worker processes
+    async def render_all(pool: ProcessPoolExecutor) -> list:
+        return await asyncio.gather(
+            *(loop.run_in_executor(pool, render, pdf_path, page_num) for page_num in page_nums),
+            return_exceptions=True,
+        )
+
+    pool = _get_process_pool(workers)
+    results = await render_all(pool)
+    if any(isinstance(result, BrokenProcessPool) for result in results):
+        logger.warning("⚠️ PDF worker pool broke while rendering, retrying with a fresh pool")
+        _discard_process_pool(workers, pool)
+        results = await render_all(_get_process_pool(workers))
+    images = []
+    for page_num, result in zip(page_nums, results):
+        if isinstance(result, Exception):
+            logger.warning("⚠️ Failed to render page %s: %s", page_num, result)
+            images.append(None)
+        else:
+            images.append(result)
+    return images
+
+def extract_toc_from_page_with_vision(pdf_path: Union[str, "fitz.Document"], page_num: int, config: Optional[RunnableConfig] = None) -> List[Dict]:
     """
     Extract TOC entries from a page using a vision model.
     """
     try:
-        print(f"🔍 Extracting TOC from page {page_num}...")
-        image_data = extract_page_as_image(pdf_path, page_num)
-        print(f"📸 Page {page_num} extracted as image: {len(image_data)} bytes")
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        vision_model = init_vision_model(config)
-        message = HumanMessage(
-            content=[
-                {
-                    "type": "text",
-                    "text": prompts.VISION_TOC_EXTRACTION_PROMPT
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{image_base64}"
-                    }
-                }
-            ]
+        logger.debug("🔍 Extracting TOC from page %s...", page_num)
+        configuration = Configuration.from_runnable_config(config)
+        image_data = _render_to_buffer(
+            extract_page_as_image, pdf_path, page_num, configuration.vision_image_max_dim, configuration.vision_jpeg_quality
         )
-        print(f"🤖 Analyzing page {page_num} with vision model...")
-        response = vision_model.invoke([message])
-        response_text = str(response.content).strip()
-        print(f"📝 Raw response: {response_text[:200]}...")
-        try:
-            toc_entries = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"⚠️ Failed to parse JSON response: {e}")
-            print(f"Raw response: {response_text}")
-            return []
-        if not isinstance(toc_entries, list):
-            print(f"⚠️ Expected list, got {type(toc_entries)}")
-            return []
+    except Exception as e:
+        logger.warning("⚠️ Vision TOC extraction failed for page %s: %s", page_num, e)
+        return []
+    return extract_toc_from_image_with_vision(image_data, page_num, config)
+
+def extract_toc_from_image_with_vision(image_data: Union[bytes, memoryview], page_num: int, config: Optional[RunnableConfig] = None) -> List[Dict]:
+    """
+    Extract TOC entries from an already rendered page image using a vision model.
+    """
+    try:
+        logger.debug("📸 Page %s extracted as image: %s bytes", page_num, len(image_data))
+        vision_model = init_vision_model(config)
+        message = build_vision_message(prompts.VISION_TOC_EXTRACTION_PROMPT, image_data, config)
+        logger.debug("🤖 Analyzing page %s with vision model...", page_num)
+        toc = vision_model.with_structured_output(TableOfContents).invoke([message])
+        valid_entries = [{**entry.model_dump(), "source_page": page_num} for entry in toc.entries]
+        logger.debug("✅ Successfully extracted %s TOC entries from page %s", len(valid_entries), page_num)
+        return valid_entries
+    except Exception as e:
+        logger.warning("⚠️ Vision TOC extraction failed for page %s: %s", page_num, e)
+        return []
+
+def extract_toc_from_images_with_vision(images: List[Union[bytes, memoryview]], page_nums: List[int], config: Optional[RunnableConfig] = None) -> List[Dict]:
+    """
+    Extract TOC entries from several rendered TOC pages in a single vision request.
+    """
+    if len(images) == 1:
+        return extract_toc_from_image_with_vision(images[0], page_nums[0], config)
+    pages_label = ", ".join(str(page_num) for page_num in page_nums)
+    try:
+        prompt = f"{prompts.VISION_TOC_EXTRACTION_PROMPT}\n\n{prompts.VISION_TOC_MULTI_PAGE_PROMPT}"
+        content = [_vision_prompt_block(prompt, config)]
+        # Label each image with its page number so the model can attribute entries to their source page
+        for page_num, image_data in zip(page_nums, images):
+            content.append({"type": "text", "text": f"PDF page {page_num}:"})
+            content.append(_vision_image_block(image_data))
+        vision_model = init_vision_model(config)
+        logger.debug("🤖 Analyzing pages %s with vision model in one request...", pages_label)
+        toc = vision_model.with_structured_output(TableOfContents).invoke([HumanMessage(content=content)])
         valid_entries = []
-        for entry in toc_entries:
-            if isinstance(entry, dict) and all(key in entry for key in ['title', 'page', 'level']):
-                entry['source_page'] = page_num
-                valid_entries.append(entry)
-            else:
-                print(f"⚠️ Invalid TOC entry: {entry}")
-        print(f"✅ Successfully extracted {len(valid_entries)} TOC entries from page {page_num}")
+        for entry in toc.entries:
+            record = entry.model_dump()
+            if record["source_page"] not in page_nums:
+                record["source_page"] = page_nums[0]
+            valid_entries.append(record)
+        logger.debug("✅ Successfully extracted %s TOC entries from pages %s", len(valid_entries), pages_label)
         return valid_entries
     except Exception as e:
-        print(f"⚠️ Vision TOC extraction failed for page {page_num}: {e}")
+        logger.warning("⚠️ Vision TOC extraction failed for pages %s: %s", pages_label, e)
+        return []
+
+async def extract_toc_from_pages_with_vision(pdf_path: str, page_nums: List[int], config: Optional[RunnableConfig] = None) -> List[Dict]:
+    """
+    Extract TOC entries from several pages, sending up to toc_pages_per_call page images per vision request.
+    """
+    rendered = await render_pages_as_images(pdf_path, page_nums, config)
+    # A page that failed to render only drops that page, not the whole TOC
+    page_nums = [page_num for page_num, image in zip(page_nums, rendered) if image is not None]
+    page_images = [image for image in rendered if image is not None]
+    if not page_nums:
+        return []
+    configuration = Configuration.from_runnable_config(config)
+    # Requests run concurrently (at most max_parallel_llm_calls in flight); gather keeps the entries in page order
+    semaphore = asyncio.Semaphore(max(1, configuration.max_parallel_llm_calls))
+    group_size = max(1, configuration.toc_pages_per_call)
+
+    async def extract(start: int) -> List[Dict]:
+        group = slice(start, start + group_size)
+        async with semaphore:
+            return await asyncio.to_thread(
+                extract_toc_from_images_with_vision, page_images[group], page_nums[group], config
+            )
+
+    results = await asyncio.gather(*(extract(start) for start in range(0, len(page_nums), group_size)))
+    return [entry for entries in results for entry in entries]
+
+def extract_toc_from_document_with_vision(pdf_path: Union[str, "fitz.Document"], page_nums: List[int], config: Optional[RunnableConfig] = None) -> List[Dict]:
+    """
+    Extract TOC entries from an open document in a worker thread.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    rendered_pages, images = [], []
+    with _open_pdf(pdf_path) as doc:
+        for page_num in page_nums:
+            try:
+                images.append(_render_to_buffer(
+                    extract_page_as_image, doc, page_num, configuration.vision_image_max_dim, configuration.vision_jpeg_quality
+                ))
+                rendered_pages.append(page_num)
+            except Exception as e:
+                logger.warning("⚠️ Vision TOC extraction failed for page %s: %s", page_num, e)
+    if not rendered_pages:
         return []
+    # Same grouping as extract_toc_from_pages_with_vision, with the requests run in a thread pool instead of the loop
+    group_size = max(1, configuration.toc_pages_per_call)
+    groups = [
+        (images[start:start + group_size], rendered_pages[start:start + group_size])
+        for start in range(0, len(rendered_pages), group_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, min(configuration.max_parallel_llm_calls, len(groups)))) as executor:
+        results = list(executor.map(lambda group: extract_toc_from_images_with_vision(*group, config), groups))
+    return [entry for entries in results for entry in entries]
 
 def find_bibliography_page_from_toc(toc_entries: List[Dict]) -> Optional[int]:
     """
     Find the bibliography/references page number from TOC entries.
     """
-    bibliography_keywords = [
-        'references', 'bibliography', 'works cited', 
-        'literature cited', 'sources', 'citations'
-    ]
     for entry in toc_entries:
-        title = entry.get('title', '').lower()
-        for keyword in bibliography_keywords:
-            if keyword in title:
-                page_num = entry.get('page')
-                if page_num and page_num > 0:
-                    print(f"📚 Found bibliography '{entry['title']}' on page {page_num}")
-                    return page_num
-    print("⚠️ No bibliography section found in TOC")
+        if _BIBLIOGRAPHY_TITLE_RE.search(entry.get('title', '')):
+            page_num = entry.get('page')
+            if page_num and page_num > 0:
+                logger.debug("📚 Found bibliography '%s' on page %s", entry['title'], page_num)
+                return page_num
+    logger.debug("⚠️ No bibliography section found in TOC")
     return None
 
-def extract_text_pymupdf_page53(pdf_path: str) -> str:
+def extract_text_pymupdf_page53(pdf_path: Union[str, "fitz.Document"]) -> str:
     """
     Extract text from page 53 using PyMuPDF.
     """
-    if not os.path.exists(pdf_path):
-        print(f"❌ File not found: {pdf_path}")
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
+        logger.error("❌ File not found: %s", pdf_path)
         return ""
     try:
-        doc = fitz.open(pdf_path)
-        if len(doc) < 53:
-            print(f"❌ Document only has {len(doc)} pages, page 53 not available")
-            doc.close()
-            return ""
-        print(f"📖 PyMuPDF: Extracting page 53")
-        page = doc[51]
-        text = page.get_text()
-        doc.close()
-        print(f"✅ PyMuPDF extracted {len(text)} characters from page 53")
+        with _open_pdf(pdf_path) as doc:
+            if len(doc) < 53:
+                logger.error("❌ Document only has %s pages, page 53 not available", len(doc))
+                return ""
+            logger.debug("📖 PyMuPDF: Extracting page 53")
+            page = doc[51]
+            text = page.get_text()
+        logger.debug("✅ PyMuPDF extracted %s characters from page 53", len(text))
         return text
     except Exception as e:
-        print(f"❌ PyMuPDF extraction failed: {e}")
+        logger.error("❌ PyMuPDF extraction failed: %s", e)
         return ""
 
 def compare_page53_extraction(pdf_path: str = "inputs/MA_Nepal_2020.pdf") -> Dict[str, str]:
@@ -336,121 +679,216 @@ def compare_page53_extraction(pdf_path: str = "inputs/MA_Nepal_2020.pdf") -> Dic
     print("=" * 80)
     return results
 
-def extract_bibliography_text_from_toc(pdf_path: str, toc_entries: List[Dict], max_pages: int = 3) -> str:
+def extract_bibliography_text_from_toc(pdf_path: Union[str, "fitz.Document"], toc_entries: List[Dict], max_pages: int = 3) -> str:
     """
     Extract bibliography text using PyMuPDF based on TOC-identified pages.
     """
-    if not os.path.exists(pdf_path):
-        print(f"❌ File not found: {pdf_path}")
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
+        logger.error("❌ File not found: %s", pdf_path)
         return ""
     bib_page = find_bibliography_page_from_toc(toc_entries)
     if not bib_page:
-        print("⚠️ No bibliography section found in TOC, defaulting to page 53")
+        logger.warning("⚠️ No bibliography section found in TOC, defaulting to page 53")
         bib_page = 53
-    print(f"📚 Extracting bibliography starting from page {bib_page}")
+    logger.debug("📚 Extracting bibliography starting from page %s", bib_page)
     try:
-        doc = fitz.open(pdf_path)
-        if bib_page > len(doc):
-            print(f"❌ Bibliography page {bib_page} exceeds document length ({len(doc)} pages)")
-            doc.close()
-            return ""
-        all_text = []
-        end_page = min(bib_page + max_pages - 1, len(doc))
-        print(f"📖 PyMuPDF: Extracting bibliography pages {bib_page}-{end_page}")
-        for page_num in range(bib_page - 1, end_page):
-            page = doc[page_num]
-            text = page.get_text()
-            if text.strip():
-                all_text.append(f"=== PAGE {page_num + 1} ===\n{text}\n")
-        doc.close()
-        combined_text = "\n".join(all_text)
-        print(f"✅ PyMuPDF extracted {len(combined_text)} characters from {end_page - bib_page + 1} pages")
+        with _open_pdf(pdf_path) as doc:
+            if bib_page > len(doc):
+                logger.error("❌ Bibliography page %s exceeds document length (%s pages)", bib_page, len(doc))
+                return ""
+            # Pages are written straight into one buffer instead of being collected and joined
+            buf = io.StringIO()
+            end_page = min(bib_page + max_pages - 1, len(doc))
+            logger.debug("📖 PyMuPDF: Extracting bibliography pages %s-%s", bib_page, end_page)
+            for page_num in range(bib_page - 1, end_page):
+                page = doc[page_num]
+                # Text blocks are separated by a blank line, so the parser can find entry boundaries
+                text = "\n\n".join(
+                    block[4].strip() for block in page.get_text("blocks") if block[6] == 0 and block[4].strip()
+                )
+                if text:
+                    if buf.tell():
+                        buf.write("\n")
+                    buf.write(f"=== PAGE {page_num + 1} ===\n")
+                    buf.write(text)
+                    buf.write("\n")
+        combined_text = buf.getvalue()
+        logger.debug("✅ PyMuPDF extracted %s characters from %s pages", len(combined_text), end_page - bib_page + 1)
         return combined_text
     except Exception as e:
-        print(f"❌ Bibliography text extraction failed: {e}")
+        logger.error("❌ Bibliography text extraction failed: %s", e)
         return ""
 
+def _parse_bibliography_chunk(model: BaseChatModel, chunk_text: str) -> List[Dict]:
+    """
+    Parse one chunk of bibliography text into structured entries.
+    """
+    bibliography_prompt = prompts.BIBLIOGRAPHY_PARSING_PROMPT.format(bibliography_text=chunk_text)
+    message = HumanMessage(content=bibliography_prompt)
+    try:
+        bibliography = model.with_structured_output(Bibliography).invoke([message])
+        # invoke returns None when the model answers without calling the schema tool
+        if bibliography is None:
+            logger.warning("⚠️ Bibliography chunk parsing returned no structured output")
+            return []
+        return [entry.model_dump() for entry in bibliography.entries]
+    except Exception as e:
+        logger.warning("⚠️ Bibliography chunk parsing failed: %s", e)
+        return []
+
+def _split_bibliography_pages(raw_text: str) -> List[str]:
+    """
+    Split bibliography text into one parse chunk per "=== PAGE N ===" block.
+    """
+    pages = [page.rstrip() for page in _PAGE_MARKER_RE.split(raw_text) if page.strip()]
+    chunks = []
+    carry = ""
+    for index, page in enumerate(pages):
+        if carry:
+            page = f"{carry}\n\n{page}"
+            carry = ""
+        # Move the page's last paragraph to the start of the next chunk, so a reference broken across a
+        # page break is parsed once, whole, rather than as two unmergeable fragments
+        split_at = page.rfind("\n\n")
+        is_last = index == len(pages) - 1
+        if not is_last and split_at != -1:
+            head, tail = page[:split_at], page[split_at + 2:]
+            # Keep the tail in place when it is too long to be a single entry, or when it is the page's only text
+            if tail.count("\n") < _MAX_CARRIED_LINES and not tail.startswith("=== PAGE "):
+                page, carry = head, tail
+        chunks.append(page + "\n")
+    return chunks
+
+def _parse_bibliography_chunks(model: BaseChatModel, chunks: List[str], max_workers: int) -> List[Dict]:
+    """
+    Parse bibliography chunks concurrently and merge the entries in order, dropping duplicates.
+    """
+    workers = max(1, min(max_workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk_results = list(executor.map(lambda chunk: _parse_bibliography_chunk(model, chunk), chunks))
+    bibliography_entries = []
+    seen = set()
+    for entries in chunk_results:
+        for entry in entries:
+            key = (entry["name"], entry["year"], entry["link"])
+            if key not in seen:
+                seen.add(key)
+                bibliography_entries.append(entry)
+    return bibliography_entries
+
 def parse_bibliography_with_llm(raw_text: str, config: Optional[RunnableConfig] = None) -> List[Dict]:
     """
     Parse raw bibliography text into structured entries using an LLM.
     """
     if not raw_text.strip():
-        print("❌ No text provided for bibliography parsing")
+        logger.error("❌ No text provided for bibliography parsing")
         return []
     try:
-        print(f"🤖 Parsing bibliography with GPT-4.1-mini ({len(raw_text)} chars)...")
-        model = init_chat_model("gpt-4.1-mini-2025-04-14", model_provider="openai")
-        bibliography_prompt = prompts.BIBLIOGRAPHY_PARSING_PROMPT.format(bibliography_text=raw_text)
-        message = HumanMessage(content=bibliography_prompt)
-        response = model.invoke([message])
-        response_text = str(response.content).strip()
-        print(f"📝 LLM response: {response_text[:200]}...")
-        try:
-            bibliography_entries = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"⚠️ Failed to parse JSON response: {e}")
-            print(f"📄 Full response length: {len(response_text)} chars")
-            print(f"📄 Response preview: {response_text[:500]}...")
-            return []
-        if not isinstance(bibliography_entries, list):
-            print(f"⚠️ Expected list, got {type(bibliography_entries)}")
-            return []
-        print(f"✅ Successfully parsed {len(bibliography_entries)} bibliography entries")
+        configuration = Configuration.from_runnable_config(config)
+        # One concurrent request per page, merged in page order
+        chunks = _split_bibliography_pages(raw_text)
+        primary = configuration.bibliography_model
+        logger.debug("🤖 Parsing bibliography with %s (%s chars, %s chunk(s))...", primary, len(raw_text), len(chunks))
+        model = init_model_by_name(primary, configuration)
+        bibliography_entries = _parse_bibliography_chunks(model, chunks, configuration.max_parallel_llm_calls)
+        # Retry with the fallback model when the primary returns fewer than bibliography_min_entries entries
+        fallback = configuration.bibliography_model_fallback
+        if fallback and len(bibliography_entries) < configuration.bibliography_min_entries:
+            logger.warning("⚠️ %s returned only %s entries, retrying with %s", primary, len(bibliography_entries), fallback)
+            fallback_model = init_model_by_name(fallback, configuration)
+            fallback_entries = _parse_bibliography_chunks(fallback_model, chunks, configuration.max_parallel_llm_calls)
+            if len(fallback_entries) > len(bibliography_entries):
+                logger.debug("📈 Fallback model used: %s entries", len(fallback_entries))
+                bibliography_entries = fallback_entries
+        else:
+            logger.debug("📈 Primary model result accepted")
+        logger.debug("✅ Successfully parsed %s bibliography entries", len(bibliography_entries))
         return bibliography_entries
     except Exception as e:
-        print(f"❌ LLM bibliography parsing failed: {e}")
+        logger.error("❌ LLM bibliography parsing failed: %s", e)
         return []
 
 def extract_bibliography_full_pipeline(pdf_path: str, config: Optional[RunnableConfig] = None) -> List[Dict]:
     """
     Complete bibliography extraction pipeline: TOC → PyMuPDF → LLM parsing.
     """
-    print("🔄 Starting complete bibliography extraction pipeline")
-    print("=" * 80)
+    logger.debug("🔄 Starting complete bibliography extraction pipeline")
     try:
-        print("📖 Step 1: Finding TOC pages...")
+        logger.debug("📖 Step 1: Finding TOC pages...")
+        # Memoized per file, so this is usually free once the TOC has been looked up
         toc_pages = find_toc_pages(pdf_path)
-        if not toc_pages:
-            print("⚠️ No TOC pages found, will use default bibliography location")
-            toc_entries = []
-        else:
-            print(f"✅ Found TOC on pages: {toc_pages}")
-            print("🤖 Step 2: Extracting TOC entries with vision...")
-            toc_entries = []
-            for toc_page in toc_pages:
-                page_entries = extract_toc_from_page_with_vision(pdf_path, toc_page, config)
-                toc_entries.extend(page_entries)
-            print(f"✅ Extracted {len(toc_entries)} total TOC entries")
-        print("📚 Step 3: Extracting bibliography text with PyMuPDF...")
-        raw_bib_text = extract_bibliography_text_from_toc(pdf_path, toc_entries)
+        # Open the PDF once for the page images and bibliography text below
+        with _open_pdf(pdf_path) as doc:
+            if not toc_pages:
+                logger.warning("⚠️ No TOC pages found, will use default bibliography location")
+                toc_entries = []
+            else:
+                logger.debug("✅ Found TOC on pages: %s", toc_pages)
+                logger.debug("🤖 Step 2: Extracting TOC entries with vision...")
+                toc_entries = extract_toc_from_document_with_vision(doc, toc_pages, config)
+                logger.debug("✅ Extracted %s total TOC entries", len(toc_entries))
+            logger.debug("📚 Step 3: Extracting bibliography text with PyMuPDF...")
+            raw_bib_text = extract_bibliography_text_from_toc(doc, toc_entries)
         if not raw_bib_text:
-            print("❌ No bibliography text extracted")
+            logger.warning("⚠️ No bibliography text extracted")
             return []
-        print("🤖 Step 4: Parsing bibliography with LLM...")
+        logger.debug("🤖 Step 4: Parsing bibliography with LLM...")
         bibliography_entries = parse_bibliography_with_llm(raw_bib_text, config)
-        print("\n" + "=" * 80)
-        print("📊 BIBLIOGRAPHY EXTRACTION SUMMARY:")
-        print("=" * 80)
-        print(f"TOC pages found: {len(toc_pages)}")
-        print(f"TOC entries extracted: {len(toc_entries)}")
-        print(f"Bibliography text length: {len(raw_bib_text)} characters")
-        print(f"Bibliography entries parsed: {len(bibliography_entries)}")
-        print("=" * 80)
+        logger.debug(
+            "📊 Bibliography extraction summary: %s TOC pages, %s TOC entries, %s characters of text, %s entries parsed",
+            len(toc_pages), len(toc_entries), len(raw_bib_text), len(bibliography_entries),
+        )
         if bibliography_entries:
-            print(f"\n✅ Bibliography extraction completed successfully!")
-            print(f"📚 Found {len(bibliography_entries)} bibliography entries")
-            print(f"\n📝 Preview of first 3 entries:")
-            for i, entry in enumerate(bibliography_entries[:3], 1):
-                name = entry.get('name', 'Unknown Name')[:60]
-                year = entry.get('year', 'Unknown Year')
-                link = entry.get('link', 'No link')
-                print(f"   {i}. {name}... ({year}) - {link}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, entry in enumerate(bibliography_entries[:3], 1):
+                    name = entry.get('name', 'Unknown Name')[:60]
+                    year = entry.get('year', 'Unknown Year')
+                    link = entry.get('link', 'No link')
+                    logger.debug("   %s. %s... (%s) - %s", i, name, year, link)
         else:
-            print("❌ No bibliography entries were successfully parsed")
+            logger.warning("⚠️ No bibliography entries were successfully parsed")
         return bibliography_entries
     except Exception as e:
-        print(f"❌ Bibliography extraction pipeline failed: {e}")
+        logger.error("❌ Bibliography extraction pipeline failed: %s", e)
+        return []
+
+def _tables_from_plumber_page(page: Any, page_num: int) -> List[Dict]:
+    """
+    Extract the tables of an open pdfplumber page.
+    """
+    tables = page.extract_tables()
+    if not tables:
+        logger.debug("⚠️ No tables found on page %s", page_num)
         return []
+    logger.debug("✅ Found %s table(s) on page %s", len(tables), page_num)
+    extracted_tables = []
+    for i, table_data in enumerate(tables, 1):
+        logger.debug("📋 Processing table %s...", i)
+        if not table_data:
+            logger.debug("   ⚠️ Table %s is empty", i)
+            continue
+        rows = len(table_data)
+        columns = len(table_data[0]) if table_data else 0
+        page_width = page.width
+        page_height = page.height
+        table_info = {
+            "table_number": i,
+            "page": page_num,
+            "library": "pdfplumber",
+            "bbox": {
+                "x0": 0,
+                "y0": 0,
+                "x1": page_width,
+                "y1": page_height
+            },
+            "rows": rows,
+            "columns": columns,
+            # Cells repeat heavily (blanks, units, labels); interning shares one string per distinct value
+            "data": [[sys.intern(cell) if isinstance(cell, str) else cell for cell in row] for row in table_data]
+        }
+        extracted_tables.append(table_info)
+        logger.debug("   📏 Table %s: %s rows x %s columns", i, rows, columns)
+    return extracted_tables
 
 def extract_tables_from_page(pdf_path: str, page_num: int) -> List[Dict]:
     """
@@ -459,121 +897,137 @@ def extract_tables_from_page(pdf_path: str, page_num: int) -> List[Dict]:
     try:
         import pdfplumber
     except ImportError:
-        print(f"❌ pdfplumber not installed. Install with: pip install pdfplumber")
+        logger.error("❌ pdfplumber not installed. Install with: pip install pdfplumber")
         return []
     if not os.path.exists(pdf_path):
-        print(f"❌ File not found: {pdf_path}")
+        logger.error("❌ File not found: %s", pdf_path)
         return []
     try:
-        print(f"📊 Extracting tables from page {page_num} using pdfplumber")
+        logger.debug("📊 Extracting tables from page %s using pdfplumber", page_num)
         with pdfplumber.open(pdf_path) as pdf:
             if page_num < 1 or page_num > len(pdf.pages):
-                print(f"❌ Invalid page number {page_num}. Document has {len(pdf.pages)} pages")
-                return []
-            page = pdf.pages[page_num - 1]
-            tables = page.extract_tables()
-            if not tables:
-                print(f"⚠️ No tables found on page {page_num}")
+                logger.error("❌ Invalid page number %s. Document has %s pages", page_num, len(pdf.pages))
                 return []
-            print(f"✅ Found {len(tables)} table(s) on page {page_num}")
-            extracted_tables = []
-            for i, table_data in enumerate(tables, 1):
-                print(f"📋 Processing table {i}...")
-                if not table_data:
-                    print(f"   ⚠️ Table {i} is empty")
-                    continue
-                rows = len(table_data)
-                columns = len(table_data[0]) if table_data else 0
-                page_width = page.width
-                page_height = page.height
-                table_info = {
-                    "table_number": i,
-                    "page": page_num,
-                    "library": "pdfplumber",
-                    "bbox": {
-                        "x0": 0,
-                        "y0": 0,
-                        "x1": page_width,
-                        "y1": page_height
-                    },
-                    "rows": rows,
-                    "columns": columns,
-                    "data": table_data
-                }
-                extracted_tables.append(table_info)
-                print(f"   📏 Table {i}: {rows} rows x {columns} columns")
-            return extracted_tables
+            return _tables_from_plumber_page(pdf.pages[page_num - 1], page_num)
     except Exception as e:
-        print(f"❌ pdfplumber table extraction failed: {e}")
+        logger.error("❌ pdfplumber table extraction failed: %s", e)
         return []
 
+def _extract_tables_from_page_range(pdf_path: str, first_page: int, last_page: int) -> List[List[Dict]]:
+    """
+    Extract tables from pages first_page..last_page (1-based, inclusive), opening the PDF once for the whole range.
+    """
+    import pdfplumber
+    results = []
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num in range(first_page, last_page + 1):
+                try:
+                    page = pdf.pages[page_num - 1]
+                except Exception as e:
+                    logger.error("❌ pdfplumber could not load page %s: %s", page_num, e)
+                    results.append([])
+                    continue
+                try:
+                    logger.debug("📊 Extracting tables from page %s using pdfplumber", page_num)
+                    results.append(_tables_from_plumber_page(page, page_num))
+                except Exception as e:
+                    logger.error("❌ pdfplumber table extraction failed: %s", e)
+                    results.append([])
+                finally:
+                    # Release the page's parsed objects; long documents would otherwise keep every page cached
+                    page.close()
+    except Exception as e:
+        logger.error("❌ pdfplumber failed on pages %s-%s: %s", first_page, last_page, e)
+    # Pad pages the range never reached, so results stay aligned with page numbers
+    results.extend([] for _ in range(last_page - first_page + 1 - len(results)))
+    return results
+
 
-def extract_all_tables_from_pdf(pdf_path: str, max_pages: int = None) -> Dict[int, List[Dict]]:
+# Below this many pages the process pool's startup and pickling cost more than they save
+_MIN_PAGES_FOR_TABLE_POOL = 5
+
+def extract_all_tables_from_pdf(pdf_path: str, max_pages: int = None, config: Optional[RunnableConfig] = None) -> Dict[int, List[Dict]]:
     """
     Extract all tables from a PDF document using pdfplumber.
     """
     if not os.path.exists(pdf_path):
-        print(f"❌ File not found: {pdf_path}")
+        logger.error("❌ File not found: %s", pdf_path)
         return {}
     try:
         import pdfplumber
         with pdfplumber.open(pdf_path) as pdf:
             total_pages = len(pdf.pages)
             pages_to_scan = min(max_pages, total_pages) if max_pages else total_pages
-            print(f"🔄 Scanning {pages_to_scan} pages for tables using pdfplumber...")
-            all_tables = {}
-            total_table_count = 0
-            for page_num in range(1, pages_to_scan + 1):
-                tables = extract_tables_from_page(pdf_path, page_num)
-                if tables:
-                    all_tables[page_num] = tables
-                    total_table_count += len(tables)
-                    print(f"   📊 Page {page_num}: {len(tables)} table(s)")
-            print(f"\n✅ Scan complete: {total_table_count} tables found across {len(all_tables)} pages")
-            return all_tables
+        logger.debug("🔄 Scanning %s pages for tables using pdfplumber...", pages_to_scan)
+        configuration = Configuration.from_runnable_config(config)
+        workers = max(1, configuration.render_workers)
+        # Table extraction is CPU-bound: split the pages into one contiguous range per worker process,
+        # each opening the PDF once for its range. Short documents are scanned in-process.
+        if pages_to_scan < _MIN_PAGES_FOR_TABLE_POOL or workers == 1:
+            results = [_extract_tables_from_page_range(pdf_path, 1, pages_to_scan)]
+        else:
+            range_size = max(1, -(-pages_to_scan // workers))
+            first_pages = range(1, pages_to_scan + 1, range_size)
+            last_pages = [min(first + range_size - 1, pages_to_scan) for first in first_pages]
+            results = _process_pool_map(
+                workers, _extract_tables_from_page_range, [pdf_path] * len(first_pages), first_pages, last_pages
+            )
+        all_tables = {}
+        total_table_count = 0
+        page_tables = (tables for range_tables in results for tables in range_tables)
+        for page_num, tables in zip(range(1, pages_to_scan + 1), page_tables):
+            if tables:
+                all_tables[page_num] = tables
+                total_table_count += len(tables)
+                logger.debug("   📊 Page %s: %s table(s)", page_num, len(tables))
+        logger.debug("✅ Scan complete: %s tables found across %s pages", total_table_count, len(all_tables))
+        return all_tables
     except Exception as e:
-        print(f"❌ PDF table scan failed: {e}")
+        logger.error("❌ PDF table scan failed: %s", e)
         return {}
 
 
-def detect_tables_by_text_analysis(pdf_path: str, page_num: int, min_columns: int = 3) -> List[Dict]:
+# Vertical distance (points) between bottom edges within which words of the text-analysis fallback count as one row
+_TABLE_ROW_TOLERANCE = 1.0
+
+def detect_tables_by_text_analysis(pdf_path: Union[str, "fitz.Document"], page_num: int, min_columns: int = 3) -> List[Dict]:
     """
     Detect table-like structures by analyzing text patterns as a fallback method.
     """
-    if not os.path.exists(pdf_path):
-        print(f"❌ File not found: {pdf_path}")
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
+        logger.error("❌ File not found: %s", pdf_path)
         return []
     try:
-        import fitz
-        print(f"🔍 Analyzing text patterns on page {page_num}")
-        doc = fitz.open(pdf_path)
-        page = doc[page_num - 1]
-        words = page.get_text("words")
+        logger.debug("🔍 Analyzing text patterns on page %s", page_num)
+        with _open_pdf(pdf_path) as doc:
+            # MuPDF returns the words in reading order: by baseline, then left to right
+            words = doc[page_num - 1].get_text("words", sort=True)
         if not words:
-            print(f"⚠️ No text found on page {page_num}")
-            doc.close()
+            logger.debug("⚠️ No text found on page %s", page_num)
             return []
-        print(f"📝 Analyzing {len(words)} words for table patterns...")
-        rows = {}
-        for word in words:
-            x0, y0, x1, y1, text, block_no, line_no, word_no = word
-            y_rounded = round(y0, 1)
-            if y_rounded not in rows:
-                rows[y_rounded] = []
-            rows[y_rounded].append((x0, text.strip()))
+        logger.debug("📝 Analyzing %s words for table patterns...", len(words))
+        # Consecutive words whose y1 (the sort key) stays within _TABLE_ROW_TOLERANCE of the row start form one row,
+        # so cells in different font sizes on one baseline (a bold header, a smaller unit column) share a row;
+        # a row's position is still its top edge, so the table bbox keeps measuring from y0
         potential_table_rows = []
-        for y in sorted(rows.keys()):
-            row_words = rows[y]
+        row_bottom, row_top, row_words = None, None, []
+        for word in words + [None]:
+            if word is not None and row_bottom is not None and abs(word[3] - row_bottom) <= _TABLE_ROW_TOLERANCE:
+                row_top = min(row_top, word[1])
+                row_words.append((word[0], word[4].strip()))
+                continue
             if len(row_words) >= min_columns:
                 row_words.sort()
                 potential_table_rows.append({
-                    "y_position": y,
+                    "y_position": round(row_top, 1),
                     "words": row_words,
                     "columns": len(row_words)
                 })
+            if word is not None:
+                row_bottom, row_top, row_words = word[3], word[1], [(word[0], word[4].strip())]
         if not potential_table_rows:
-            print(f"⚠️ No table patterns found (need at least {min_columns} columns)")
-            doc.close()
+            logger.debug("⚠️ No table patterns found (need at least %s columns)", min_columns)
             return []
         tables = []
         current_table_rows = []
@@ -590,7 +1044,7 @@ def detect_tables_by_text_analysis(pdf_path: str, page_num: int, min_columns: in
             prev_y = y
         if len(current_table_rows) >= 2:
             tables.append(current_table_rows)
-        print(f"✅ Found {len(tables)} potential table(s)")
+        logger.debug("✅ Found %s potential table(s)", len(tables))
         extracted_tables = []
         for i, table_rows in enumerate(tables, 1):
             table_data = []
@@ -622,44 +1076,83 @@ def detect_tables_by_text_analysis(pdf_path: str, page_num: int, min_columns: in
                 "data": table_data
             }
             extracted_tables.append(table_info)
-            print(f"   📋 Table {i}: {len(table_data)} rows x {max_columns} columns")
-        doc.close()
+            logger.debug("   📋 Table %s: %s rows x %s columns", i, len(table_data), max_columns)
         return extracted_tables
     except Exception as e:
-        print(f"❌ Text-based table detection failed: {e}")
+        logger.error("❌ Text-based table detection failed: %s", e)
         return []
     
     
-def extract_metadata_from_user_query(user_query: str) -> Dict:
+# Successful metadata extractions keyed by (user_query, current_year); failures are not cached
+_QUERY_METADATA_CACHE: OrderedDict[tuple, Dict] = OrderedDict()
+_QUERY_METADATA_CACHE_SIZE = 32
+_QUERY_METADATA_CACHE_LOCK = threading.Lock()
+# Per-key locks for extractions in progress, so concurrent callers for one query share a single LLM call
+_QUERY_METADATA_INFLIGHT: Dict[tuple, threading.Lock] = {}
+
+def _cached_query_metadata(key: tuple) -> Optional[Dict]:
+    """
+    Return a copy of the memoized metadata for key, or None on a miss.
+    """
+    with _QUERY_METADATA_CACHE_LOCK:
+        if key in _QUERY_METADATA_CACHE:
+            _QUERY_METADATA_CACHE.move_to_end(key)
+            return dict(_QUERY_METADATA_CACHE[key])
+    return None
+
+def extract_metadata_from_user_query(user_query: str, config: Optional[RunnableConfig] = None) -> Dict:
     """
     Extract metadata from the user query.
     """
     metadata = {}
+    current_year = datetime.now().year
+    # Memoized per query, since the same query is re-parsed for every reference and every batched document
+    key = (user_query, current_year)
+    cached = _cached_query_metadata(key)
+    if cached is not None:
+        return cached
+    with _QUERY_METADATA_CACHE_LOCK:
+        inflight = _QUERY_METADATA_INFLIGHT.setdefault(key, threading.Lock())
     
-    try:
-        print(f"Extracting metadata from user query: {user_query}")
-        model = init_chat_model("gpt-4.1-nano-2025-04-14", model_provider="openai")
-        metadata_prompt = prompts.METADATA_EXTRACTION_PROMPT.format(user_query=user_query, current_year=datetime.now().year)
-        message = HumanMessage(content=metadata_prompt)
-        response = model.invoke([message])
-        metadata = json.loads(response.content)
-    except Exception as e:
-        print(f"❌ Metadata extraction failed: {e}")
-        return {}
-    
+    with inflight:
+        try:
+            cached = _cached_query_metadata(key)
+            if cached is not None:
+                return cached
+            logger.debug("Extracting metadata from user query: %s", user_query)
+            configuration = Configuration.from_runnable_config(config)
+            model = init_model_by_name("openai/gpt-4.1-nano-2025-04-14", configuration)
+            metadata_prompt = prompts.METADATA_EXTRACTION_PROMPT.format(user_query=user_query, current_year=current_year)
+            message = HumanMessage(content=metadata_prompt)
+            response = model.invoke([message])
+            metadata = _json_loads(response.content)
+            if not isinstance(metadata, dict):
+                raise ValueError(f"expected a JSON object, got {type(metadata).__name__}")
+        except Exception as e:
+            logger.error("❌ Metadata extraction failed: %s", e)
+            return {}
+        else:
+            with _QUERY_METADATA_CACHE_LOCK:
+                _QUERY_METADATA_CACHE[key] = dict(metadata)
+                while len(_QUERY_METADATA_CACHE) > _QUERY_METADATA_CACHE_SIZE:
+                    _QUERY_METADATA_CACHE.popitem(last=False)
+        finally:
+            # Every caller that got this lock removes it, unless a newer caller has already replaced it
+            with _QUERY_METADATA_CACHE_LOCK:
+                if _QUERY_METADATA_INFLIGHT.get(key) is inflight:
+                    del _QUERY_METADATA_INFLIGHT[key]
     return metadata
 
 
-def generate_search_query(user_query: str, reference: dict) -> str:
+def generate_search_query(metadata: Dict, reference: dict) -> str:
     '''
     Generate a search query based on the metadata and reference.
     ''' 
     
-    name, year, link = reference.get("name"), reference.get("year"), reference.get("link")
-    metadata = extract_metadata_from_user_query(user_query)
+    name = reference.get("name") or ""
     query_year = metadata.get("year")
     
-    cleaned_name = re.sub(r"\b(20\d{2}|19\d{2})\b", "", name).strip()
+    cleaned_name = _YEAR_RE.sub("", name).strip()
     
     query_parts = [cleaned_name]
     if query_year:
@@ -667,3 +1160,11 @@ def generate_search_query(user_query: str, reference: dict) -> str:
     query_parts.extend([str(v) for k, v in metadata.items() if v and k != "year" ])
     search_query = " ".join(query_parts).strip()
     return search_query
+
+
+def generate_search_queries(user_query: str, references: List[dict], config: Optional[RunnableConfig] = None) -> List[str]:
+    """
+    Generate search queries for many references, extracting the query metadata only once.
+    """
+    metadata = extract_metadata_from_user_query(user_query, config)
+    return [generate_search_query(metadata, reference) for reference in references]
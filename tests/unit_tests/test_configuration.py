@@ -3,3 +3,11 @@ from enrichment_agent.configuration import Configuration
 
 def test_configuration_from_none() -> None:
     Configuration.from_runnable_config()
+
+
+def test_configuration_ignores_unknown_keys() -> None:
+    config = Configuration.from_runnable_config(
+        {"configurable": {"max_loops": 2, "thread_id": "abc"}}
+    )
+    assert config.max_loops == 2
+    assert "_INIT_FIELDS" not in Configuration._init_field_names()
@@ -0,0 +1,12 @@
+from enrichment_agent import prompts
+
+
+def test_render_main_prompt_matches_format() -> None:
+    info = '{"price": "$5"}'
+    rendered = prompts.render_main_prompt(info, "Nepal")
+    assert rendered == prompts.MAIN_PROMPT.format(info=info, topic="Nepal")
+
+
+def test_render_main_prompt_with_custom_template() -> None:
+    template = "Find {info} about {topic} {{literally}}"
+    assert prompts.render_main_prompt("x", "y", template) == template.format(info="x", topic="y")
@@ -0,0 +1,29 @@
+from enrichment_agent.state import DocumentInfo, DocumentStructure, merge_fields
+
+
+def test_merge_fields_keeps_disjoint_updates() -> None:
+    left = DocumentInfo(path="doc.pdf", file_type="PDF")
+    right = DocumentInfo(title="A Title")
+    merged = merge_fields(left, right)
+    assert merged == DocumentInfo(path="doc.pdf", file_type="PDF", title="A Title")
+
+
+def test_merge_fields_handles_missing_side() -> None:
+    structure = DocumentStructure(references=[])
+    assert merge_fields(None, structure) is structure
+    assert merge_fields(structure, None) is structure
+
+
+def test_window_messages_keeps_recent_and_drops_orphan_tool_messages() -> None:
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    from enrichment_agent.state import window_messages
+
+    history = [
+        HumanMessage(content="q", id="1"),
+        AIMessage(content="", id="2", tool_calls=[{"name": "t", "args": {}, "id": "c"}]),
+        ToolMessage(content="r", tool_call_id="c", id="3"),
+    ]
+    merged = window_messages(history, [AIMessage(content="a", id="4")], max_keep=2)
+    assert [m.id for m in merged] == ["4"]
+    assert len(window_messages(history, [], max_keep=5)) == 3